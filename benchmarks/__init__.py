@@ -0,0 +1,7 @@
+"""
+Performance benchmarks for matlabette
+
+Run from the repository root, for example:
+
+    python -m benchmarks.tokenizer
+"""
@@ -0,0 +1,77 @@
+"""
+Checks that assigning an array to another variable doesn't copy it
+
+    python -m benchmarks.copy_on_write [--sizes-mb MB [MB ...]]
+                                       [--budget-ms MS]
+
+For each size, `b = a` is timed on a square matrix of that many megabytes
+along with the growth in peak memory it causes, then `b(1) = 1` is timed,
+which is when the copy happens. Exits with status 1 if `b = a` takes
+longer than the budget or grows peak memory by more than a hundredth of
+the matrix. The default sizes go up to 1 GB.
+"""
+from __future__ import unicode_literals, print_function
+import argparse
+import math
+import resource
+import sys
+import time
+
+from matlabette.context import Context
+from matlabette.lexer import Lexer
+from matlabette.parser import Parser
+
+
+def peak_memory():
+    """
+    Peak resident memory of the process in bytes
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run(context, line):
+    statement = context.prepare(Parser(Lexer.lex(line)).parse())
+    start = time.time()
+    statement()
+    return (time.time() - start) * 1000
+
+
+def measure(megabytes):
+    context = Context()
+    size = int(math.sqrt(megabytes * (1 << 20) / 8))
+    # filled so its pages count towards resident memory
+    run(context, "a = ones({});".format(size))
+    before = peak_memory()
+    share = run(context, "b = a;")
+    growth = peak_memory() - before
+    write = run(context, "b(1) = 1;")
+    return size, share, growth, write
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes-mb", type=int, nargs='+', default=[16, 128, 1024]
+    )
+    parser.add_argument("--budget-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    failed = False
+    print("{:>8} {:>12} {:>12} {:>14} {:>14}".format(
+        "MB", "matrix", "b = a (ms)", "growth (MB)", "b(1) = 1 (ms)"))
+    for megabytes in args.sizes_mb:
+        size, share, growth, write = measure(megabytes)
+        print("{:>8} {:>12} {:>12.3f} {:>14.1f} {:>14.1f}".format(
+            megabytes, "{0}x{0}".format(size), share,
+            growth / float(1 << 20), write))
+        if share > args.budget_ms or growth > megabytes * (1 << 20) / 100:
+            failed = True
+    if failed:
+        print("FAIL: b = a copied the matrix")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
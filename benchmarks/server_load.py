@@ -0,0 +1,118 @@
+"""
+Load tests the session server
+
+    python -m benchmarks.server_load [--sessions N] [--requests N]
+                                     [--heavy-sessions N] [--heavy-size N]
+                                     [--processes N]
+
+Starts a server on a temporary Unix socket, then runs sessions on their
+own threads, each sending light statements as fast as the answers come
+back. Heavy sessions meanwhile multiply large matrices over and over.
+Reports the throughput and latency of the light statements, which should
+stay low while the heavy work goes to the process pool; compare with
+--processes 0.
+"""
+from __future__ import unicode_literals, print_function
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from matlabette.client import Client
+from matlabette.server import create_server
+
+light = [
+    "a = [1 2; 3 4];",
+    "b = a * 2 + 1",
+    "c = a' .* b",
+    "inv(a)",
+]
+
+
+def light_session(socket_path, requests, latencies):
+    client = Client(socket_path)
+    for i in range(requests):
+        start = time.time()
+        client.execute(light[i % len(light)])
+        latencies.append(time.time() - start)
+    client.close()
+
+
+def heavy_session(socket_path, size, stop):
+    client = Client(socket_path)
+    client.execute("h = rand({});".format(size))
+    while not stop.is_set():
+        client.execute("g = h * h;")
+    client.close()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--heavy-sessions", type=int, default=2)
+    parser.add_argument("--heavy-size", type=int, default=600)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    socket_path = os.path.join(directory, 'matlabette.sock')
+    server = create_server(socket_path, processes=args.processes)
+    threading.Thread(target=server.serve_forever).start()
+    try:
+        stop = threading.Event()
+        heavy = [
+            threading.Thread(
+                target=heavy_session,
+                args=(socket_path, args.heavy_size, stop)
+            )
+            for _ in range(args.heavy_sessions)
+        ]
+        for thread in heavy:
+            thread.start()
+        # let the heavy sessions get going
+        time.sleep(0.5)
+
+        latencies = []
+        sessions = [
+            threading.Thread(
+                target=light_session,
+                args=(socket_path, args.requests, latencies)
+            )
+            for _ in range(args.sessions)
+        ]
+        start = time.time()
+        for thread in sessions:
+            thread.start()
+        for thread in sessions:
+            thread.join()
+        elapsed = time.time() - start
+        stop.set()
+        for thread in heavy:
+            thread.join()
+    finally:
+        server.shutdown()
+        server.server_close()
+        if server.pool is not None:
+            server.pool.terminate()
+        shutil.rmtree(directory)
+
+    print("sessions:    {} light, {} heavy ({}x{} products)".format(
+        args.sessions, args.heavy_sessions, args.heavy_size,
+        args.heavy_size))
+    print("requests:    {}".format(len(latencies)))
+    print("throughput:  {:.0f} requests/s".format(len(latencies) / elapsed))
+    print("latency p50: {:.2f} ms".format(percentile(latencies, 0.5) * 1000))
+    print("latency p99: {:.2f} ms".format(
+        percentile(latencies, 0.99) * 1000))
+
+
+if __name__ == '__main__':
+    main()
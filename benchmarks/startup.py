@@ -0,0 +1,97 @@
+"""
+Checks that the non-interactive matlabette command starts within a budget
+
+    python -m benchmarks.startup [--budget-ms MS] [--runs N]
+
+Measures how much longer `matlabette -c` takes than a bare interpreter and
+exits with status 1 if that exceeds the budget, or if the path loads
+prompt_toolkit, Pygments or colorama. On Python 3.7+ the slowest imports
+reported by `python -X importtime` are listed as well.
+"""
+from __future__ import unicode_literals, print_function
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+forbidden = ('prompt_toolkit', 'pygments', 'colorama')
+startup = "from matlabette.main import run; run(['-c', 'a = 1'])"
+loaded_modules = (
+    "import sys; from matlabette.main import run; run(['-c', 'a = 1']); "
+    "sys.stderr.write(' '.join(sys.modules))"
+)
+
+
+def python(code, *options):
+    command = [sys.executable] + list(options) + ['-c', code]
+    process = subprocess.Popen(
+        command, cwd=root, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    out, err = process.communicate()
+    return out.decode('utf-8'), err.decode('utf-8')
+
+
+def fastest(code, runs):
+    times = []
+    for _ in range(runs):
+        start = time.time()
+        python(code)
+        times.append(time.time() - start)
+    return min(times) * 1000
+
+
+def slowest_imports(count=10):
+    """
+    Return the imports with the largest cumulative time from -X importtime
+    """
+    _, err = python(startup, '-X', 'importtime')
+    imports = []
+    for line in err.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            imports.append((int(fields[1]), fields[2].strip()))
+        except ValueError:
+            pass
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget-ms", type=float, default=120.0)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    interpreter = fastest("pass", args.runs)
+    matlabette = fastest(startup, args.runs)
+    overhead = matlabette - interpreter
+    print("interpreter: {:.1f} ms".format(interpreter))
+    print("matlabette:  {:.1f} ms".format(matlabette))
+    print("overhead:    {:.1f} ms (budget {:.1f} ms)".format(
+        overhead, args.budget_ms))
+
+    if sys.version_info >= (3, 7):
+        print("slowest imports (cumulative us):")
+        for microseconds, name in slowest_imports():
+            print("  {:>8} {}".format(microseconds, name))
+
+    _, err = python(loaded_modules)
+    loaded = sorted(set(
+        name.split('.')[0] for name in err.split()
+        if name.split('.')[0] in forbidden
+    ))
+    failed = False
+    if loaded:
+        print("FAIL: loaded {}".format(", ".join(loaded)))
+        failed = True
+    if overhead > args.budget_ms:
+        print("FAIL: startup overhead exceeds the budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
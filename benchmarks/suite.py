@@ -0,0 +1,279 @@
+"""
+Benchmark suite for the lexer, parser, evaluator, operators, display and
+workspace files
+
+    python -m benchmarks.suite run [--sizes SIZE [SIZE ...]]
+                                   [--filter TEXT] [--output FILE]
+    python -m benchmarks.suite compare BASELINE RESULTS [--threshold T]
+
+Every benchmark runs once per size: a scalar, a 10x10 and a 1000x1000
+matrix, and a vector of 10^7 elements. Cases that don't apply to a size,
+such as inverting a vector or writing 10^7 numbers as text, are skipped.
+Inputs come from a fixed seed, and each result is the best time per call
+over several rounds, in seconds.
+
+run writes the results as JSON, to stdout or FILE. compare lists the
+benchmarks in RESULTS more than THRESHOLD (a fraction, 0.1 by default)
+slower than in BASELINE, and exits with status 1 if there are any.
+"""
+from __future__ import unicode_literals, print_function
+from collections import OrderedDict
+from functools import partial
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import timeit
+
+import numpy
+
+from matlabette import workspace
+from matlabette.cache import StatementCache
+from matlabette.context import Context
+from matlabette.lexer import Lexer
+from matlabette.operators import Operators
+from matlabette.parser import Parser
+
+sizes = OrderedDict([
+    ('scalar', None),
+    ('10x10', (10, 10)),
+    ('1000x1000', (1000, 1000)),
+    ('1e7', (1, 10 ** 7)),
+])
+# array literals and text workspaces of more elements are skipped
+max_text_elements = 10 ** 6
+
+
+def value(size, random):
+    shape = sizes[size]
+    if shape is None:
+        return float(random.uniform(1, 2))
+    # kept away from zero so divisions are well behaved
+    return random.uniform(1, 2, shape)
+
+
+def literal(a):
+    """
+    The array literal for a, or the number if a is a scalar
+    """
+    if not isinstance(a, numpy.ndarray):
+        return repr(a)
+    return "[" + "; ".join(
+        " ".join("%.6g" % cell for cell in row) for row in a
+    ) + "]"
+
+
+def operator_cases(size, a, b, s):
+    """
+    Return a function calling each Operators method on values of size,
+    or None where the method doesn't apply
+    """
+    shape = sizes[size]
+    array = shape is not None
+    square = array and shape[0] == shape[1]
+    count = 1 if shape is None else shape[0] * shape[1]
+    # the arguments of the constructors for an array of the shape
+    dimensions = [] if shape is None else [float(shape[0])] \
+        if square else [float(shape[0]), float(shape[1])]
+    cases = OrderedDict([
+        ('add', (Operators.add, a, b)),
+        ('subtract', (Operators.subtract, a, b)),
+        ('multiply', (Operators.multiply, a, b) if not array or square
+            else (Operators.multiply, a, s)),
+        ('divide', (Operators.divide, a, b) if not array or square
+            else (Operators.divide, a, s)),
+        ('left_divide', (Operators.left_divide, a, b) if not array or square
+            else (Operators.left_divide, s, a)),
+        ('elem_add', (Operators.elem_add, a, b)),
+        ('elem_subtract', (Operators.elem_subtract, a, b)),
+        ('elem_multiply', (Operators.elem_multiply, a, b)),
+        ('elem_divide', (Operators.elem_divide, a, b)),
+        ('transpose', (Operators.transpose, a)),
+        ('invert', (Operators.invert, [a]) if square else None),
+        ('transpose_function',
+            (Operators.transpose_function, [a]) if array else None),
+        ('range', (Operators.range, [1.0, float(count)])),
+        ('zeros', (Operators.zeros, dimensions)),
+        ('ones', (Operators.ones, dimensions)),
+        ('eye', (Operators.eye, dimensions)),
+        ('rand', (partial(Operators.rand, numpy.random.RandomState(0)),
+                  dimensions)),
+        ('randn', (partial(Operators.randn, numpy.random.RandomState(0)),
+                   dimensions)),
+        ('seed', (partial(Operators.seed, numpy.random.RandomState(0)),
+                  [0.0]) if not array else None),
+        ('linspace', (Operators.linspace, [0.0, 1.0, float(count)])),
+    ])
+    return OrderedDict(
+        (name, partial(*case) if case else None)
+        for name, case in cases.items()
+    )
+
+
+def workspace_cases(a, directory):
+    """
+    Return the benchmarks of saving and loading workspaces, in text and
+    binary: the work of Repl.save and Repl.load, without their messages
+    """
+    context = Context()
+    context.store(u'a', a)
+    statements = StatementCache()
+
+    def run_line(line):
+        statements.statement(line, context)()
+
+    def load(filename):
+        workspace.load(filename, context, run_line)
+        context.materialize()
+
+    binary = os.path.join(directory, 'workspace.mlw')
+    workspace.save(binary, context, True)
+    cases = OrderedDict([
+        ('workspace.save_binary',
+            partial(workspace.save, binary, context, True)),
+        ('workspace.load_binary', partial(load, binary)),
+    ])
+    # writing 10^7 numbers as text would dwarf everything else
+    if numpy.size(a) <= max_text_elements:
+        text = os.path.join(directory, 'workspace.txt')
+        workspace.save(text, context)
+        cases['workspace.save_text'] = partial(workspace.save, text, context)
+        cases['workspace.load_text'] = partial(load, text)
+    return cases
+
+
+def cases(size, directory):
+    """
+    Return every benchmark for size, by name
+    """
+    random = numpy.random.RandomState(0)
+    a, b, s = value(size, random), value(size, random), 3.0
+    context = Context()
+    context.store(u'a', a)
+    context.store(u'b', b)
+    statement = "c = a .* b + a;"
+    parse_tree = Parser(Lexer.lex(statement)).parse()
+    compiled = context.prepare(parse_tree)
+    walker = Context(use_compiler=False)
+    walker.store(u'a', a)
+    walker.store(u'b', b)
+
+    benchmarks = OrderedDict()
+    if numpy.size(a) <= max_text_elements:
+        line = "a = " + literal(a)
+        tokens = Lexer.lex(line)
+        benchmarks['lexer.lex'] = partial(Lexer.lex, line)
+        benchmarks['parser.parse'] = lambda: Parser(tokens).parse()
+        benchmarks['context.serialize'] = context.serialize
+    benchmarks['context.evaluate'] = partial(walker.evaluate, parse_tree)
+    benchmarks['context.compiled'] = compiled
+    benchmarks['context.show'] = lambda: "".join(context.show(u'a'))
+    for name, case in operator_cases(size, a, b, s).items():
+        benchmarks['operators.' + name] = case
+    benchmarks.update(workspace_cases(a, directory))
+    return benchmarks
+
+
+def measure(function, min_time=0.2, rounds=3):
+    """
+    Return the best time per call of function in seconds, calling it
+    enough times per round for the round to take at least min_time
+    """
+    timer = timeit.Timer(function)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed * 10 > min_time else 10
+    best = elapsed
+    for _ in range(rounds - 1):
+        best = min(best, timer.timeit(number))
+    return best / number
+
+
+def run(arguments):
+    directory = tempfile.mkdtemp(prefix='matlabette-benchmarks-')
+    results = OrderedDict()
+    try:
+        for size in arguments.sizes:
+            for name, function in cases(size, directory).items():
+                key = "{}[{}]".format(name, size)
+                if function is None or arguments.filter not in key:
+                    continue
+                results[key] = measure(function)
+                sys.stderr.write("{:<45} {:.6g} s\n".format(key, results[key]))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    document = json.dumps(OrderedDict([
+        ('python', platform.python_version()),
+        ('numpy', numpy.__version__),
+        ('platform', platform.platform()),
+        ('results', results),
+    ]), indent=2)
+    if arguments.output:
+        with open(arguments.output, 'w') as f:
+            f.write(document + "\n")
+    else:
+        print(document)
+    return 0
+
+
+def compare(arguments):
+    with open(arguments.baseline) as f:
+        baseline = json.load(f)['results']
+    with open(arguments.results) as f:
+        results = json.load(f)['results']
+
+    regressions = 0
+    print("{:<45} {:>12} {:>12} {:>8}".format(
+        "benchmark", "baseline (s)", "result (s)", "change"))
+    for name in sorted(set(baseline) & set(results)):
+        before, after = baseline[name], results[name]
+        change = after / before - 1 if before else 0.0
+        flag = ""
+        if change > arguments.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print("{:<45} {:>12.6g} {:>12.6g} {:>+7.1%}{}".format(
+            name, before, after, change, flag))
+    missing = len(set(baseline) - set(results))
+    if missing:
+        print("{} benchmarks in the baseline were not run".format(missing))
+    print("{} regressions above {:.0%}".format(
+        regressions, arguments.threshold))
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    commands = parser.add_subparsers(dest='command')
+    run_parser = commands.add_parser('run', help="run the benchmarks")
+    run_parser.add_argument(
+        '--sizes', nargs='+', choices=list(sizes), default=list(sizes)
+    )
+    run_parser.add_argument(
+        '--filter', default='',
+        help="only run benchmarks whose name contains this"
+    )
+    run_parser.add_argument('--output', help="write the results here")
+    compare_parser = commands.add_parser(
+        'compare', help="compare results with a baseline"
+    )
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('results')
+    compare_parser.add_argument('--threshold', type=float, default=0.1)
+    arguments = parser.parse_args()
+    if arguments.command == 'run':
+        return run(arguments)
+    return compare(arguments)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Compares the built-in tokenizer with the Pygments one
+
+    python -m benchmarks.tokenizer [--lines N]
+"""
+from __future__ import unicode_literals, print_function
+import argparse
+import random
+import time
+
+from matlabette.lexer import Lexer
+
+
+def generate_lines(count, seed=0):
+    """
+    Generate count statements of the shapes found in scripts and saved
+    workspaces
+    """
+    rng = random.Random(seed)
+    shapes = [
+        "a{i} = [{n} {n} {n}; {n} {n} {n}]",
+        "b{i} = a{i} * {n} + {n}",
+        "c{i} = a{i}' .* b{i} - {n}",
+        "inv([{n} 0; 0 {n}])",
+        "d{i} = {n}",
+    ]
+    lines = []
+    for i in range(count):
+        line = rng.choice(shapes).replace("{i}", str(i))
+        while "{n}" in line:
+            number = round(rng.uniform(0, 100), rng.randint(0, 3))
+            line = line.replace("{n}", str(number), 1)
+        lines.append(line + "\n")
+    return lines
+
+
+def measure(lex, lines):
+    start = time.time()
+    for line in lines:
+        lex(line)
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=100000)
+    args = parser.parse_args()
+
+    lines = generate_lines(args.lines)
+    mismatches = sum(
+        1 for line in lines[:1000]
+        if Lexer.lex(line) != Lexer.pygments_lex(line)
+    )
+    builtin = measure(Lexer.lex, lines)
+    pygments = measure(Lexer.pygments_lex, lines)
+
+    print("lines:     {}".format(len(lines)))
+    print("builtin:   {:.3f}s ({:.0f} lines/s)".format(
+        builtin, len(lines) / builtin))
+    print("pygments:  {:.3f}s ({:.0f} lines/s)".format(
+        pygments, len(lines) / pygments))
+    print("speedup:   {:.1f}x".format(pygments / builtin))
+    print("mismatched token streams in first 1000 lines: {}".format(
+        mismatches))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+Runs many scripts in parallel
+
+    matlabette batch SCRIPT... [--jobs N] [--save-dir DIR]
+
+A pool of worker processes is started once, so the cost of starting
+Python and importing numpy is paid once per worker rather than once per
+script. Each script runs in a fresh Context in whichever worker is free,
+and the results come back in the order the scripts were given.
+
+The variables a script leaves behind are sent back with its output.
+Large arrays are not pickled: the worker writes them to a binary
+workspace in shared memory, /dev/shm where there is one, and the parent
+maps it.
+"""
+from __future__ import unicode_literals
+from StringIO import StringIO
+from files import replace
+from script import ScriptRunner
+from operators import is_array
+import workspace
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+
+# set in each worker: where to write the workspaces of finished scripts,
+# and whether to compile statements
+directory = None
+compile_statements = True
+
+
+class Result(object):
+    """
+    The outcome of one script
+    """
+
+    def __init__(self, filename, status, output, errors, variables=None,
+                 workspace_file=None):
+        self.filename = filename
+        self.status = status
+        self.output = output
+        self.errors = errors
+        self.variables = variables
+        # the binary workspace holding the variables, if they were large
+        self.workspace_file = workspace_file
+
+
+def initialize(workspace_directory, use_compiler):
+    global directory, compile_statements
+    directory = workspace_directory
+    compile_statements = use_compiler
+
+
+def run(filename):
+    """
+    Run one script in a worker
+    """
+    out, err = StringIO(), StringIO()
+    runner = ScriptRunner(out, err, compile_statements)
+    try:
+        with open(filename, 'r') as f:
+            status = runner.run(f, filename)
+        context = runner.context
+        context.materialize()
+    except IOError as e:
+        return Result(filename, 2, "", "Error: {}{}".format(e, os.linesep))
+    except Exception as e:
+        # reported with the script's output, so the rest of the batch runs
+        return Result(filename, 1, out.getvalue(), err.getvalue() +
+                      "Error: {}{}".format(e, os.linesep))
+    variables = context.variables
+    if not any(is_array(value) and value.nbytes >= workspace.MMAP_THRESHOLD
+               for value in variables.values()):
+        return Result(
+            filename, status, out.getvalue(), err.getvalue(), variables
+        )
+    handle, path = tempfile.mkstemp(suffix=workspace.BINARY_EXTENSION,
+                                    dir=directory)
+    with os.fdopen(handle, 'wb') as f:
+        workspace.write_binary(f, variables)
+    return Result(
+        filename, status, out.getvalue(), err.getvalue(), workspace_file=path
+    )
+
+
+def shared_memory():
+    return '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def run_batch(filenames, jobs=None, use_compiler=True):
+    """
+    Run the scripts in filenames on jobs processes, one per CPU if None
+    :return: an iterator over the results in the order of filenames. The
+    workspace file a result's variables are mapped from is removed when
+    the next result is asked for
+    """
+    workspace_directory = tempfile.mkdtemp(
+        prefix='matlabette-', dir=shared_memory()
+    )
+    pool = multiprocessing.Pool(
+        jobs, initialize, (workspace_directory, use_compiler)
+    )
+    try:
+        for result in pool.imap(run, filenames):
+            if result.workspace_file is None:
+                yield result
+                continue
+            result.variables = workspace.read_binary(result.workspace_file)
+            yield result
+            # the mapped arrays stay valid, and shared memory is freed as
+            # soon as they are no longer used
+            os.remove(result.workspace_file)
+        pool.close()
+    finally:
+        pool.terminate()
+        shutil.rmtree(workspace_directory, ignore_errors=True)
+
+
+def save_workspace(result, save_directory):
+    """
+    Save the variables of result as a binary workspace named after the
+    script in save_directory
+    """
+    name = os.path.splitext(os.path.basename(result.filename))[0]
+    filename = os.path.join(
+        save_directory, name + workspace.BINARY_EXTENSION
+    )
+    if result.workspace_file is not None:
+        shutil.copyfile(result.workspace_file, filename)
+        return
+    temporary = filename + '.tmp'
+    with open(temporary, 'wb') as f:
+        workspace.write_binary(f, result.variables)
+    replace(temporary, filename)
+
+
+def run_files(filenames, jobs=None, save_directory=None, use_compiler=True):
+    """
+    Run the scripts and write their output and errors in order
+    :return: the highest exit status of the scripts
+    """
+    status = 0
+    for result in run_batch(filenames, jobs, use_compiler):
+        sys.stdout.write(result.output)
+        sys.stdout.flush()
+        sys.stderr.write(result.errors)
+        if save_directory is not None and result.variables is not None:
+            save_workspace(result, save_directory)
+        status = max(status, result.status)
+    return status
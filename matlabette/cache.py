@@ -0,0 +1,144 @@
+"""
+Caches prepared statements so repeated lines skip lexing and parsing, and
+matrix factorizations so repeated solves against an unchanged matrix skip
+factorizing it
+"""
+from __future__ import unicode_literals
+from collections import OrderedDict
+from lexer import Lexer
+from parser import Parser
+import os
+
+
+class StatementCache(object):
+    """
+    Bounded LRU cache mapping a source line to its prepared statement
+    """
+
+    def __init__(self, size=1024):
+        self.size = size
+        self.statements = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(line):
+        return line.strip()
+
+    def get(self, line):
+        """
+        Return the statement cached for line or None
+        """
+        key = self.normalize(line)
+        statement = self.statements.pop(key, None)
+        if statement is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.statements[key] = statement
+        return statement
+
+    def put(self, line, statement):
+        key = self.normalize(line)
+        self.statements.pop(key, None)
+        if len(self.statements) >= self.size:
+            self.statements.popitem(last=False)
+        self.statements[key] = statement
+
+    def statement(self, line, context):
+        """
+        Return the prepared statement for line, lexing and parsing it only
+        if it is not cached
+        """
+        statement = self.get(line)
+        if statement is None:
+            parse_tree = Parser(Lexer.lex(line)).parse()
+            statement = context.prepare(parse_tree)
+            self.put(line, statement)
+        return statement
+
+    def clear(self):
+        self.statements.clear()
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+    def report(self):
+        """
+        Generate string for displaying the cache statistics
+        """
+        return "{0} Statement cache: {1} of {2} entries, {3} hits, " \
+               "{4} misses ({5:.1%} hit rate){0}".format(
+                   os.linesep,
+                   len(self.statements),
+                   self.size,
+                   self.hits,
+                   self.misses,
+                   self.hit_rate
+               )
+
+
+class FactorizationCache(object):
+    """
+    LRU cache of factorizations and inverses of variables, holding at most
+    budget bytes. Keys include the version of the variable so a changed
+    variable is never served a stale factorization
+    """
+
+    def __init__(self, budget=256 << 20):
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def fetch(self, key, compute):
+        """
+        Return the cached value for key, or cache and return compute().
+        Values are arrays or factorizations, which both report nbytes
+        """
+        value = self.entries.pop(key, None)
+        if value is not None:
+            self.hits += 1
+            self.entries[key] = value
+            return value
+        self.misses += 1
+        value = compute()
+        if not getattr(value, 'reusable', True):
+            # keeping it would save nothing, so it would only be a false hit
+            return value
+        nbytes = value.nbytes
+        if nbytes <= self.budget:
+            while self.entries and self.bytes + nbytes > self.budget:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= evicted.nbytes
+            self.entries[key] = value
+            self.bytes += nbytes
+        return value
+
+    def discard(self, variable):
+        """
+        Drop the entries of variable, which has changed
+        """
+        for key in [key for key in self.entries if key[0] == variable]:
+            self.bytes -= self.entries.pop(key).nbytes
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def report(self):
+        """
+        Generate string for displaying the cache statistics
+        """
+        return "{0} Factorization cache: {1} entries, {2} of {3} bytes, " \
+               "{4} hits, {5} misses{0}".format(
+                   os.linesep,
+                   len(self.entries),
+                   self.bytes,
+                   self.budget,
+                   self.hits,
+                   self.misses
+               )
@@ -0,0 +1,101 @@
+"""
+Evaluation of chained matrix products
+
+a * b * c * d gives the same matrix whichever pair is multiplied first,
+but not at the same cost: with d a column vector, a * (b * (c * d)) only
+ever makes vectors while ((a * b) * c) * d makes full matrices. A
+MatrixChain picks the cheapest order for the shapes of its operands with
+the classic dynamic programming solution, and remembers it for the next
+time it sees the same shapes.
+"""
+from __future__ import unicode_literals
+from errors import MatlabetteRuntimeError, InvalidArgumentsForOperator
+from operators import is_array
+
+
+def cheapest_order(dimensions):
+    """
+    Find the cheapest way to multiply a chain of matrices, where matrix i
+    is dimensions[i] x dimensions[i + 1]
+    :return: the order as nested (left, right) pairs of operand indices
+    """
+    count = len(dimensions) - 1
+    cost = [[0] * count for _ in range(count)]
+    split = [[0] * count for _ in range(count)]
+    for length in range(2, count + 1):
+        for first in range(count - length + 1):
+            last = first + length - 1
+            cost[first][last] = None
+            for middle in range(first, last):
+                candidate = cost[first][middle] + cost[middle + 1][last] + \
+                    dimensions[first] * dimensions[middle + 1] * \
+                    dimensions[last + 1]
+                if cost[first][last] is None or candidate < cost[first][last]:
+                    cost[first][last] = candidate
+                    split[first][last] = middle
+
+    def order(first, last):
+        if first == last:
+            return first
+        middle = split[first][last]
+        return order(first, middle), order(middle + 1, last)
+    return order(0, count - 1)
+
+
+class MatrixChain(object):
+    """
+    Multiplies the compiled operands of a chain of * operators
+    """
+    # plans kept before the cache is cleared
+    max_plans = 64
+
+    def __init__(self, operands, multiply):
+        self.operands = operands
+        self.multiply = multiply
+        self.plans = {}
+
+    def __call__(self):
+        values = [operand() for operand in self.operands]
+        shapes = tuple(
+            value.shape if is_array(value) else None for value in values
+        )
+        plan = self.plans.get(shapes)
+        if plan is None:
+            plan = self.plan(shapes)
+            if len(self.plans) >= self.max_plans:
+                self.plans.clear()
+            self.plans[shapes] = plan
+        try:
+            return self.run(plan, values)
+        except InvalidArgumentsForOperator:
+            raise MatlabetteRuntimeError("Invalid arguments for operator *")
+
+    def plan(self, shapes):
+        """
+        Return the order to multiply in, or None to keep the order of the
+        parse tree when the operands are not a chain of conforming
+        matrices
+        """
+        for shape in shapes:
+            if shape is None or len(shape) != 2:
+                return None
+        for left, right in zip(shapes, shapes[1:]):
+            if left[1] != right[0]:
+                return None
+        return cheapest_order(
+            [shape[0] for shape in shapes] + [shapes[-1][1]]
+        )
+
+    def run(self, plan, values):
+        if plan is None:
+            # right to left, as the parse tree nests them
+            result = values[-1]
+            for value in reversed(values[:-1]):
+                result = self.multiply(value, result)
+            return result
+        if isinstance(plan, tuple):
+            left, right = plan
+            return self.multiply(
+                self.run(left, values), self.run(right, values)
+            )
+        return values[plan]
@@ -0,0 +1,72 @@
+"""
+Talks to a server started with matlabette serve
+
+    matlabette connect (--socket PATH | --port PORT)
+
+connect sends the statements read from stdin, one per line, and writes
+what the server sends back, errors to stderr.
+"""
+from __future__ import unicode_literals
+from errors import MatlabetteRuntimeError
+import json
+import os
+import socket
+import sys
+
+
+class Client(object):
+    """
+    A session on the server
+    """
+
+    def __init__(self, socket_path=None, port=None):
+        if socket_path is not None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(socket_path)
+        else:
+            self.socket = socket.create_connection(('127.0.0.1', port))
+        self.responses = self.socket.makefile('rb')
+        self.count = 0
+
+    def execute(self, statement):
+        """
+        Run statement in the session
+        :return: the output, or None if the statement ended the session
+        """
+        self.count += 1
+        request = {'id': self.count, 'statement': statement}
+        self.socket.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        line = self.responses.readline()
+        if not line:
+            return None
+        response = json.loads(line.decode('utf-8'))
+        if 'error' in response:
+            raise MatlabetteRuntimeError(response['error'])
+        return response['output']
+
+    def close(self):
+        self.responses.close()
+        self.socket.close()
+
+
+def connect(socket_path=None, port=None):
+    client = Client(socket_path, port)
+    status = 0
+    try:
+        for line in iter(sys.stdin.readline, ''):
+            if not line.strip():
+                continue
+            try:
+                output = client.execute(line.rstrip('\r\n'))
+            except MatlabetteRuntimeError as e:
+                sys.stderr.write("Error: {}{}".format(e.message, os.linesep))
+                status = 1
+                continue
+            if output is None:
+                break
+            if output:
+                sys.stdout.write(output + os.linesep)
+                sys.stdout.flush()
+    finally:
+        client.close()
+    return status
@@ -0,0 +1,463 @@
+"""
+Turns parse trees into nested Python closures
+
+Operators, functions and variable lookups are resolved once, when the
+tree is compiled, so running the compiled statement again does not walk
+the tree or look anything up in the operation tables. Chains of
+element-wise operators are compiled into a single FusedExpression and
+chains of matrix products into a MatrixChain. Products with inv(X) are
+solved rather than inverted, and solves against a variable reuse its
+factorization until the variable changes. Updates such as a = a + 1 write
+into the array already in a when nothing else uses it.
+
+Every operation checks the context's cancelled flag before it starts, so a
+cancelled statement stops between operations, never between changing a
+variable and recording the change.
+"""
+from __future__ import unicode_literals
+from errors import (
+    MatlabetteError,
+    MatlabetteRuntimeError,
+    InvalidArgumentsForOperator,
+    JobCancelled
+)
+from operators import Operators, is_array, is_matrix, is_scalar
+import linalg
+from fusion import FusedExpression, ufuncs
+from chain import MatrixChain
+import numpy
+
+
+class Compiler(object):
+
+    def __init__(self, context):
+        self.context = context
+
+    def compile(self, parse_tree):
+        """
+        Return a function that evaluates parse_tree in the context
+        """
+        code = self.node(parse_tree)
+
+        def statement():
+            try:
+                return code()
+            except MatlabetteError:
+                raise
+            except Exception as e:
+                raise MatlabetteRuntimeError(e.message)
+        return statement
+
+    def node(self, parse_tree):
+        """
+        Compile one node, mirroring Context.evaluate
+        """
+        op = parse_tree.operator
+        if op:
+            if op == u'call':
+                call = self.call(parse_tree)
+                inverse = self.inverse_argument(parse_tree)
+                if inverse is not None and self.variable_name(inverse):
+                    return self.cached_inverse(inverse, call)
+                return call
+            if op == u'=' and parse_tree.left_child.operator == u'call':
+                return self.indexed_assignment(parse_tree)
+            if op == u'=':
+                update = self.update_in_place(parse_tree)
+                if update is not None:
+                    return update
+            if parse_tree.value is not None:
+                if op not in self.context.unary_operations:
+                    raise MatlabetteRuntimeError(op)
+                value = self.constant(parse_tree.value) if parse_tree.locked \
+                    else self.value(parse_tree.value)
+                return self.unary(op, value)
+            if op not in self.context.binary_operations:
+                raise MatlabetteRuntimeError(op)
+            factors = self.factors(parse_tree)
+            if len(factors) == 2 and self.is_inverse_product(factors):
+                return self.inverse_product(*factors)
+            if len(factors) > 2:
+                return MatrixChain(
+                    [self.node(factor) for factor in factors],
+                    self.checked(self.context.binary_operations[op])
+                )
+            if op in ufuncs:
+                return self.fuse(parse_tree)
+            return self.binary(
+                op,
+                self.node(parse_tree.left_child),
+                self.node(parse_tree.right_child),
+                self.action(op, parse_tree)
+            )
+        elif parse_tree.value is not None:
+            if parse_tree.locked:
+                return self.constant(parse_tree.value)
+            return self.value(parse_tree.value)
+        elif parse_tree.left_child:
+            return self.node(parse_tree.left_child)
+        elif parse_tree.right_child:
+            return self.node(parse_tree.right_child)
+        return self.constant(None)
+
+    def fuse(self, parse_tree):
+        """
+        Compile the element-wise operators under parse_tree into one
+        FusedExpression, or a plain binary operation if there is only one
+        """
+        leaves = []
+        program = []
+
+        def visit(node):
+            node = self.unwrap(node)
+            op = node.operator
+            if op not in ufuncs or node.value is not None \
+                    or op not in self.context.binary_operations \
+                    or len(self.factors(node)) > 2 \
+                    or self.is_inverse_product(self.factors(node)):
+                leaves.append(self.node(node))
+                return ('leaf', len(leaves) - 1)
+            left = visit(node.left_child)
+            right = visit(node.right_child)
+            program.append((op, self.action(op, node), left, right))
+            return ('step', len(program) - 1)
+
+        visit(parse_tree)
+        if len(program) == 1:
+            op, action, left, right = program[0]
+            return self.binary(
+                op, leaves[left[1]], leaves[right[1]], action
+            )
+
+        def slot(operand):
+            kind, index = operand
+            return index if kind == 'leaf' else len(leaves) + index
+        return FusedExpression(leaves, [
+            (op, action, slot(left), slot(right))
+            for op, action, left, right in program
+        ])
+
+    def call(self, parse_tree):
+        """
+        Compile name(arguments), which indexes the variable name if there
+        is one when it runs and otherwise calls the function name
+        """
+        name = parse_tree.left_child.value
+        arguments = [
+            self.node(argument) for argument in parse_tree.right_child.value
+        ]
+        context = self.context
+        call = context.call
+
+        def call_or_index():
+            if context.cancelled:
+                raise JobCancelled
+            return call(name, arguments)
+        return call_or_index
+
+    def indexed_assignment(self, parse_tree):
+        """
+        Compile name(indices) = expr
+        """
+        target = parse_tree.left_child
+        name = target.left_child.value
+        indices = [self.node(index) for index in target.right_child.value]
+        value = self.node(parse_tree.right_child)
+        context = self.context
+        assign_indexed = context.assign_indexed
+
+        def assignment():
+            if context.cancelled:
+                raise JobCancelled
+            return assign_indexed(name, indices, value())
+        return assignment
+
+    def update_in_place(self, parse_tree):
+        """
+        Compile name = name op x, for an element-wise op, to write the
+        result into the array in name instead of a new one when no other
+        variable uses the array and x is a scalar or an array of its shape
+        that doesn't overlap it. Returns None for other assignments
+        """
+        name = parse_tree.left_child.value
+        update = self.unwrap(parse_tree.right_child)
+        op = update.operator
+        if op not in ufuncs or update.value is not None \
+                or op not in self.context.binary_operations \
+                or self.variable_name(update.left_child) != name \
+                or len(self.factors(update)) > 2 \
+                or self.is_inverse_product(self.factors(update)):
+            return None
+        ufunc = ufuncs[op]
+        # element-wise only with a scalar operand
+        scalar_only = op in (u'*', u'/')
+        action = self.action(op, update)
+        target = self.node(update.left_child)
+        operand = self.node(update.right_child)
+        context = self.context
+
+        def in_place():
+            if context.cancelled:
+                raise JobCancelled
+            value, other = target(), operand()
+            if is_array(value) and value.flags.writeable \
+                    and value.dtype == numpy.float64 \
+                    and (is_scalar(other) or not scalar_only
+                         and is_array(other) and other.shape == value.shape
+                         and not numpy.may_share_memory(value, other)) \
+                    and not context.is_shared(value):
+                ufunc(value, other, out=value)
+                context.changed(name)
+                return context.show(name)
+            try:
+                result = action(value, other)
+            except InvalidArgumentsForOperator:
+                raise MatlabetteRuntimeError(
+                    "Invalid arguments for operator {}".format(op)
+                )
+            return context.assign(name, result)
+        return in_place
+
+    def action(self, op, parse_tree):
+        """
+        Return the function applying the binary operator of parse_tree.
+        Divisions by a variable reuse its factorization
+        """
+        action = self.context.binary_operations[op]
+        factorize = self.context.factorize
+        if original(action) is Operators.left_divide:
+            name = self.variable_name(parse_tree.left_child)
+            if name is not None:
+                return lambda lhs, rhs: action(
+                    lhs, rhs, lambda: factorize(name, lhs)
+                )
+        if original(action) is Operators.divide:
+            name = self.variable_name(parse_tree.right_child)
+            if name is not None:
+                return lambda lhs, rhs: action(
+                    lhs, rhs, lambda: factorize(name, rhs, True)
+                )
+        return action
+
+    def variable_name(self, parse_tree):
+        """
+        Return the variable name if parse_tree is just a variable
+        """
+        node = self.unwrap(parse_tree)
+        if node.operator is None and not node.locked \
+                and isinstance(node.value, unicode):
+            return node.value
+        return None
+
+    @staticmethod
+    def unwrap(parse_tree):
+        """
+        Skip the nodes that only wrap another
+        """
+        while parse_tree.operator is None and parse_tree.value is None \
+                and parse_tree.left_child and not parse_tree.right_child:
+            parse_tree = parse_tree.left_child
+        return parse_tree
+
+    @staticmethod
+    def factors(parse_tree):
+        """
+        Return the operands of the chain of * operators starting at
+        parse_tree, which the parser nests to the right
+        """
+        factors = []
+        node = parse_tree
+        while node.operator == u'*' and node.value is None:
+            factors.append(node.left_child)
+            node = Compiler.unwrap(node.right_child)
+        if factors:
+            factors.append(node)
+        return factors
+
+    def inverse_argument(self, parse_tree):
+        """
+        Return the argument of parse_tree if it is a call to inv with a
+        single argument, otherwise None. A variable named inv is only
+        known about when the statement runs, so what is compiled from this
+        has to check for one
+        """
+        node = self.unwrap(parse_tree)
+        if node.operator != u'call' or node.left_child.value != u'inv' \
+                or original(self.context.functions.get(u'inv')) \
+                is not Operators.invert:
+            return None
+        arguments = node.right_child.value
+        if not isinstance(arguments, list) or len(arguments) != 1 \
+                or isinstance(arguments[0], list):
+            return None
+        return arguments[0]
+
+    def is_inverse_product(self, factors):
+        return len(factors) == 2 and any(
+            self.inverse_argument(factor) is not None for factor in factors
+        )
+
+    def inverse_product(self, left, right):
+        """
+        Compile inv(X) * y as X \\ y and y * inv(X) as y / X. Anything a
+        solve can't stand in for, such as a non-square X or operands that
+        don't conform, is still inverted so it fails the same way
+        """
+        multiply = self.context.binary_operations[u'*']
+        product = self.binary(u'*', self.node(left), self.node(right))
+        inverse_first = self.inverse_argument(left) is not None
+        if inverse_first:
+            left = self.inverse_argument(left)
+            name = self.variable_name(left)
+        else:
+            right = self.inverse_argument(right)
+            name = self.variable_name(right)
+        left, right = self.node(left), self.node(right)
+        context = self.context
+
+        def inverse_product():
+            if context.cancelled:
+                raise JobCancelled
+            if context.is_variable(u'inv'):
+                return product()
+            lhs, rhs = left(), right()
+            matrix, other = (lhs, rhs) if inverse_first else (rhs, lhs)
+            try:
+                if not is_matrix(matrix) or not is_array(other) \
+                        or matrix.shape[0] != matrix.shape[1]:
+                    pass
+                elif inverse_first and other.shape[0] == matrix.shape[0]:
+                    return linalg.solve(matrix, other, name and
+                                        context.factorize(name, matrix))
+                elif not inverse_first and other.shape[1] == matrix.shape[0]:
+                    return linalg.right_divide(
+                        other, matrix,
+                        name and context.factorize(name, matrix, True)
+                    )
+                if name and is_array(matrix):
+                    inverse = context.invert(name, matrix)
+                else:
+                    inverse = Operators.invert([matrix])
+                if inverse_first:
+                    return multiply(inverse, other)
+                return multiply(other, inverse)
+            except InvalidArgumentsForOperator:
+                raise MatlabetteRuntimeError(
+                    "Invalid arguments for operator *"
+                )
+        return inverse_product
+
+    def cached_inverse(self, argument, call):
+        """
+        Compile inv(x) for a variable x, reusing the inverse until x
+        changes. call is the compiled call, for when inv is a variable
+        """
+        name = self.variable_name(argument)
+        matrix = self.node(argument)
+        context = self.context
+        invert = context.invert
+
+        def inverse():
+            if context.cancelled:
+                raise JobCancelled
+            if context.is_variable(u'inv'):
+                return call()
+            value = matrix()
+            if not is_array(value):
+                return Operators.invert([value])
+            return invert(name, value)
+        return inverse
+
+    def checked(self, action):
+        """
+        Return action, checking for cancellation before each call
+        """
+        context = self.context
+
+        def checked_action(lhs, rhs):
+            if context.cancelled:
+                raise JobCancelled
+            return action(lhs, rhs)
+        return checked_action
+
+    def unary(self, op, value):
+        context = self.context
+        action = context.unary_operations[op]
+
+        def unary():
+            if context.cancelled:
+                raise JobCancelled
+            try:
+                return action(value())
+            except InvalidArgumentsForOperator:
+                raise MatlabetteRuntimeError(
+                    "Invalid arguments for operator {}".format(op)
+                )
+        return unary
+
+    def binary(self, op, left, right, action=None):
+        context = self.context
+        action = action or context.binary_operations[op]
+
+        def binary():
+            if context.cancelled:
+                raise JobCancelled
+            try:
+                return action(left(), right())
+            except InvalidArgumentsForOperator:
+                raise MatlabetteRuntimeError(
+                    "Invalid arguments for operator {}".format(op)
+                )
+        return binary
+
+    def value(self, node_value):
+        """
+        Compile a node value, mirroring Context.evaluate_value
+        """
+        # node_value is a variable name
+        if isinstance(node_value, unicode):
+            dereference = self.context.dereference
+
+            def variable():
+                return dereference(node_value)
+            return variable
+
+        # node_value is a list of arguments
+        if isinstance(node_value, list) and node_value \
+                and not isinstance(node_value[0], list):
+            expressions = [self.node(expr) for expr in node_value]
+
+            def arguments():
+                return [expr() for expr in expressions]
+            return arguments
+
+        # node_value is an array
+        if isinstance(node_value, list):
+            if not node_value:
+                return lambda: numpy.empty((0, 0))
+            shape = (len(node_value), len(node_value[0]))
+            if any(len(row) != shape[1] for row in node_value):
+                raise MatlabetteRuntimeError("Unequal column sizes")
+            cells = [self.node(cell) for row in node_value for cell in row]
+
+            def array():
+                values = [cell() for cell in cells]
+                for value in values:
+                    if is_array(value):
+                        raise MatlabetteRuntimeError(
+                            "Nested arrays not allowed"
+                        )
+                return numpy.array(values, dtype=float).reshape(shape)
+            return array
+        return self.constant(node_value)
+
+    @staticmethod
+    def constant(value):
+        return lambda: value
+
+
+def original(function):
+    """
+    Return the function a profiler wrapped, or function if it isn't one
+    """
+    return getattr(function, 'wrapped', function)
@@ -0,0 +1,99 @@
+"""
+Completion of names at the prompt
+
+The names seen in the history, the variables, the functions and the
+commands are kept in a prefix trie that is built once when the REPL starts
+and added to as lines are entered and variables assigned, so completing
+never has to read the history again.
+"""
+from __future__ import unicode_literals
+import re
+
+name = re.compile(r'[a-zA-Z_]\w*', re.UNICODE)
+# marks a node that ends a word and holds its spellings
+END = None
+
+
+class PrefixTrie(object):
+    """
+    Case insensitive prefix trie of words
+    """
+
+    def __init__(self, words=()):
+        self.root = {}
+        self.size = 0
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        node = self.root
+        for character in word.lower():
+            node = node.setdefault(character, {})
+        spellings = node.setdefault(END, set())
+        if word not in spellings:
+            spellings.add(word)
+            self.size += 1
+
+    def __contains__(self, word):
+        node = self.find(word)
+        return node is not None and word in node.get(END, ())
+
+    def __len__(self):
+        return self.size
+
+    def find(self, prefix):
+        node = self.root
+        for character in prefix.lower():
+            node = node.get(character)
+            if node is None:
+                return None
+        return node
+
+    def complete(self, prefix, limit=100):
+        """
+        Return up to limit words starting with prefix, shortest first
+        """
+        node = self.find(prefix)
+        if node is None:
+            return []
+        words = []
+        level = [node]
+        while level and len(words) < limit:
+            next_level = []
+            for node in level:
+                words.extend(sorted(node.get(END, ())))
+                characters = sorted(key for key in node if key is not END)
+                next_level.extend(node[key] for key in characters)
+            level = next_level
+        return words[:limit]
+
+
+class CompletionIndex(PrefixTrie):
+    """
+    The names offered for completion
+    """
+
+    def add_line(self, line):
+        """
+        Add the names used in a line of input
+        """
+        for word in name.findall(line):
+            self.add(word)
+
+
+def prompt_completer(index):
+    """
+    Return a prompt_toolkit completer over index. prompt_toolkit is slow to
+    import so it is only imported here, once there is a prompt
+    """
+    from prompt_toolkit.completion import Completer, Completion
+
+    class IndexCompleter(Completer):
+        def get_completions(self, document, complete_event):
+            word = document.get_word_before_cursor()
+            if not name.match(word):
+                return
+            for match in index.complete(word):
+                if match != word:
+                    yield Completion(match, -len(word))
+    return IndexCompleter()
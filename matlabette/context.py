@@ -2,36 +2,116 @@
 Holds the state of the system
 """
 from __future__ import unicode_literals, print_function
-from errors import MatlabetteRuntimeError, InvalidArgumentsForOperator
-from operators import Operators
+from errors import (
+    MatlabetteRuntimeError,
+    InvalidArgumentsForOperator,
+    JobCancelled
+)
+from operators import Operators, is_array
+from compiler import Compiler
+from cache import FactorizationCache
+from display import Display
+import indexing
+import linalg
 import os
+from functools import partial
+from timeit import default_timer
+import numpy
 
 
 class Context(object):
 
-    def __init__(self, commands=None):
+    def __init__(self, commands=None, use_compiler=True):
         self.variables = {}
+        # variables from a loaded workspace that are read on first use
+        self.pending = {}
+        # variables changed since the workspace was last saved
+        self.dirty = set()
+        # bumped every time a variable changes
+        self.versions = {}
+        # called with the name of every variable that changes
+        self.change_hooks = []
+        # the variables holding each array, by the id of the array that
+        # owns its memory. Assigning an array to another variable shares
+        # it, and it is only copied when one of them changes it in place
+        self.owners = {}
+        self.factorizations = FactorizationCache()
+        # set from another thread to stop the running statement before its
+        # next operation
+        self.cancelled = False
         self.binary_operations = {
             u'=': self.assign,
             u'+': Operators.add,
             u'-': Operators.subtract,
             u'*': Operators.multiply,
             u'/': Operators.divide,
+            u'\\': Operators.left_divide,
             u'.+': Operators.elem_add,
             u'.-': Operators.elem_subtract,
             u'.*': Operators.elem_multiply,
             u'./': Operators.elem_divide,
-            u'call': self.function_call,
         }
         self.unary_operations = {
             u'show': self.show,
             u'\'': Operators.transpose,
+            u':': Operators.range,
+            u'end': self.end,
         }
-        self.commands = commands or {}
+        # the sizes 'end' stands for in the indices being evaluated,
+        # innermost last
+        self.ends = []
+        self.commands = dict(commands or {})
+        self.commands.setdefault(u'tic', self.start_timer)
+        self.commands.setdefault(u'toc', self.elapsed)
+        # when tic was last run
+        self.timer = None
+        # seeded with rng(seed) for repeatable rand and randn
+        self.random = numpy.random.RandomState()
         self.functions = {
             u'inv': Operators.invert,
-            u'transpose': Operators.transpose_function
+            u'transpose': Operators.transpose_function,
+            u'zeros': Operators.zeros,
+            u'ones': Operators.ones,
+            u'eye': Operators.eye,
+            u'rand': partial(Operators.rand, self.random),
+            u'randn': partial(Operators.randn, self.random),
+            u'rng': partial(Operators.seed, self.random),
+            u'linspace': Operators.linspace,
+            u'tic': self.tic,
+            u'toc': self.toc,
         }
+        # arrays with more elements are shown truncated to their first
+        # and last display_edge rows and columns
+        self.display_limit = 1000
+        self.display_edge = 5
+        self.use_compiler = use_compiler
+        self.compiler = Compiler(self)
+
+    def execute(self, parse_tree):
+        """
+        Run a parsed statement
+        """
+        return self.prepare(parse_tree)()
+
+    def prepare(self, parse_tree):
+        """
+        Turn the parse tree into a function that can be run repeatedly.
+        The tree is compiled unless use_compiler is turned off
+        """
+        if self.use_compiler:
+            statement = self.compiler.compile(parse_tree)
+        else:
+            statement = partial(self.evaluate, parse_tree)
+        if parse_tree.silent:
+            return partial(self.silently, statement)
+        return statement
+
+    @staticmethod
+    def silently(statement):
+        """
+        Run a statement ending in ';' without displaying its result
+        """
+        statement()
 
     def evaluate(self, parse_tree):
         """
@@ -40,7 +120,19 @@ class Context(object):
         """
         op = parse_tree.operator
         if op:
+            if self.cancelled:
+                raise JobCancelled
             try:
+                if op == u'call':
+                    return self.call(*self.call_arguments(parse_tree))
+                if op == u'=' and parse_tree.left_child.operator == u'call':
+                    name, arguments = self.call_arguments(
+                        parse_tree.left_child
+                    )
+                    return self.assign_indexed(
+                        name, arguments,
+                        self.evaluate(parse_tree.right_child)
+                    )
                 if parse_tree.value is not None:
                     action = self.unary_operations[op]
                     value = parse_tree.value if parse_tree.locked \
@@ -68,6 +160,16 @@ class Context(object):
         elif parse_tree.right_child:
             return self.evaluate(parse_tree.right_child)
 
+    def call_arguments(self, parse_tree):
+        """
+        Return the name called at a call node, and a function evaluating
+        each of its arguments
+        """
+        return parse_tree.left_child.value, [
+            partial(self.evaluate, argument)
+            for argument in parse_tree.right_child.value
+        ]
+
     def evaluate_value(self, node_value):
         """
         Return the value represented by a node value
@@ -76,79 +178,242 @@ class Context(object):
         if isinstance(node_value, unicode):
             return self.dereference(node_value)
 
+        # node_value is a list of arguments
+        if isinstance(node_value, list) and node_value \
+                and not isinstance(node_value[0], list):
+            return [self.evaluate(expr) for expr in node_value]
+
         # node_value is an array
         if isinstance(node_value, list):
             if not node_value:
-                return node_value
-            values = []
-
-            if not isinstance(node_value[0], list):
-                for expr in node_value:
-                    value = self.evaluate(expr)
-                    values.append(value)
-
-            else:
-                column_count = len(node_value[0])
-                for row in node_value:
-                    values_row = []
-                    for cell in row:
-                        value = self.evaluate(cell)
-                        if isinstance(value, list):
-                            raise MatlabetteRuntimeError(
-                                "Nested arrays not allowed"
-                            )
-                        values_row.append(value)
-                    if len(values_row) != column_count:
+                return numpy.empty((0, 0))
+            column_count = len(node_value[0])
+            values = numpy.empty((len(node_value), column_count))
+            for i, row in enumerate(node_value):
+                if len(row) != column_count:
+                    raise MatlabetteRuntimeError(
+                        "Unequal column sizes"
+                    )
+                for j, cell in enumerate(row):
+                    value = self.evaluate(cell)
+                    if is_array(value):
                         raise MatlabetteRuntimeError(
-                            "Unequal column sizes"
+                            "Nested arrays not allowed"
                         )
-                    values.append(values_row)
+                    values[i, j] = value
             return values
         return node_value
 
     def dereference(self, variable):
         """
-        Return value stored in variable
+        Return value stored in variable. Without such a variable, a
+        function of that name is called with no arguments, as in t = toc
         """
         if variable not in self.variables:
-            raise MatlabetteRuntimeError(
-                "{} is not defined".format(variable)
-            )
+            if variable not in self.pending:
+                if variable in self.functions:
+                    return self.function_call(variable, [])
+                raise MatlabetteRuntimeError(
+                    "{} is not defined".format(variable)
+                )
+            self.materialize(variable)
         return self.variables[variable]
 
     def assign(self, variable, value):
         """
         Assigns value to variable
         """
+        self.store(variable, value)
+        return self.show(variable)
+
+    def store(self, variable, value):
+        """
+        Assigns value to variable without displaying it
+        """
         if variable in self.commands:
             raise MatlabetteRuntimeError(
                 "{} is reserved".format(variable)
             )
+        self.pending.pop(variable, None)
+        self.hold(variable, value)
+        self.changed(variable)
+
+    def defer(self, variable, loader):
+        """
+        Make loader provide the value of variable the first time it is used
+        """
+        if variable in self.commands:
+            raise MatlabetteRuntimeError(
+                "{} is reserved".format(variable)
+            )
+        self.release(variable)
+        self.pending[variable] = loader
+        self.changed(variable)
+
+    def hold(self, variable, value):
+        """
+        Keep value in variable, noting which array's memory it uses
+        """
+        self.release(variable)
         self.variables[variable] = value
-        return self.show(variable)
+        if is_array(value):
+            self.owners.setdefault(id(root(value)), set()).add(variable)
+
+    def release(self, variable):
+        """
+        Drop the value of variable
+        """
+        value = self.variables.pop(variable, None)
+        if is_array(value):
+            key = id(root(value))
+            owners = self.owners[key]
+            owners.discard(variable)
+            if not owners:
+                del self.owners[key]
+
+    def is_shared(self, array):
+        """
+        Return whether more than one variable uses the memory of array
+        """
+        return len(self.owners.get(id(root(array)), ())) > 1
+
+    def changed(self, variable):
+        """
+        Record that the value of variable has changed
+        """
+        self.dirty.add(variable)
+        self.versions[variable] = self.versions.get(variable, 0) + 1
+        self.factorizations.discard(variable)
+        for hook in self.change_hooks:
+            hook(variable)
+
+    def factorize(self, variable, matrix, transposed=False):
+        """
+        Return the factorization of matrix, the value of variable, or of
+        its transpose, reusing it until variable changes
+        """
+        key = (variable, self.versions.get(variable), 'factorization',
+               transposed)
+        return self.factorizations.fetch(
+            key,
+            lambda: linalg.factorize(matrix.T if transposed else matrix)
+        )
+
+    def invert(self, variable, matrix):
+        """
+        Return the inverse of matrix, the value of variable, reusing it
+        until variable changes
+        """
+        def inverse():
+            value = Operators.invert([matrix])
+            value.setflags(write=False)
+            return value
+        key = (variable, self.versions.get(variable), 'inverse')
+        return self.factorizations.fetch(key, inverse)
+
+    def materialize(self, variable=None):
+        """
+        Load a deferred variable, or all of them if variable is None
+        """
+        for name in [variable] if variable else list(self.pending):
+            self.hold(name, self.pending[name]())
+            del self.pending[name]
 
     def show(self, variable):
         """
-        Generate string for displaying variable
+        Return the display of variable, which is rendered as it is written
+        out
         """
         if variable in self.commands:
             return self.commands[variable]()
 
-        value = self.dereference(variable)
-        output = "{} {} =".format(os.linesep, variable)
-        spacer = "    "
-        if isinstance(value, list):
-            if value:
-                output += os.linesep
-                for row in value:
-                    for cell in row:
-                        output += "{}{}".format(spacer, cell)
-                    output += os.linesep
+        return Display(
+            variable, self.dereference(variable),
+            self.display_limit, self.display_edge
+        )
+
+    def is_variable(self, name):
+        return name in self.variables or name in self.pending
+
+    def call(self, name, arguments):
+        """
+        Index the variable name, or call the function name if there is no
+        such variable. arguments are functions evaluating each argument
+        """
+        if self.is_variable(name):
+            value = self.dereference(name)
+            return indexing.read(value, self.indices(value, arguments))
+        return self.function_call(
+            name, [argument() for argument in arguments]
+        )
+
+    def assign_indexed(self, name, arguments, value):
+        """
+        Assign value to part of the array in variable name, in place unless
+        the array can't be written to or another variable shares it
+        """
+        array = self.dereference(name)
+        scalar = not is_array(array)
+        if scalar:
+            array = numpy.array([[array]])
+        elif not array.flags.writeable or self.is_shared(array):
+            # copy on write
+            array = array.copy()
+        indexing.write(array, self.indices(array, arguments), value)
+        self.hold(name, float(array[0, 0]) if scalar else array)
+        self.changed(name)
+        return self.show(name)
+
+    def indices(self, value, arguments):
+        """
+        Evaluate the indices into value, with 'end' standing for the size
+        of the dimension each indexes
+        """
+        shape = value.shape if is_array(value) else (1, 1)
+        indices = []
+        for dimension, argument in enumerate(arguments):
+            if len(arguments) == 1:
+                self.ends.append(shape[0] * shape[1])
             else:
-                output += " []" + os.linesep
-        else:
-            output += " {}".format(value) + os.linesep
-        return output
+                self.ends.append(shape[dimension] if dimension < 2 else 1)
+            try:
+                indices.append(argument())
+            finally:
+                self.ends.pop()
+        return indices
+
+    def end(self, _):
+        if not self.ends:
+            raise MatlabetteRuntimeError("'end' can only be used in an index")
+        return float(self.ends[-1])
+
+    def tic(self, params):
+        """
+        Start the stopwatch, returning the time it started for toc
+        """
+        if params:
+            raise MatlabetteRuntimeError('tic takes no arguments')
+        self.timer = default_timer()
+        return self.timer
+
+    def toc(self, params):
+        """
+        Return the seconds since tic, or since the time tic returned
+        """
+        if len(params) > 1 or params and not isinstance(params[0], float):
+            raise MatlabetteRuntimeError('Invalid argument for toc')
+        start = params[0] if params else self.timer
+        if start is None:
+            raise MatlabetteRuntimeError('Call tic before toc')
+        return default_timer() - start
+
+    def start_timer(self):
+        self.tic([])
+
+    def elapsed(self):
+        return "{0} Elapsed time is {1:.6f} seconds.{0}".format(
+            os.linesep, self.toc([])
+        )
 
     def function_call(self, function, params):
         if function not in self.functions:
@@ -156,6 +421,7 @@ class Context(object):
         return self.functions[function](params)
 
     def serialize(self):
+        self.materialize()
         return "\n".join(
             [k + ' = ' + self.serialize_variable(v)
              for k, v in self.variables.items()]
@@ -163,12 +429,19 @@ class Context(object):
 
     def serialize_variable(self, variable):
         if isinstance(variable, float):
-            return str(variable)
-        if isinstance(variable, list):
-            if not variable:
+            return repr(float(variable))
+        if is_array(variable):
+            if not variable.size:
                 return "[]"
-            if isinstance(variable[0], list):
-                return "[" + "; ".join(
-                    [self.serialize_variable(i) for i in variable]
-                ) + "]"
-            return " ".join([str(i) for i in variable])
+            return "[" + "; ".join(
+                [", ".join([repr(float(i)) for i in row]) for row in variable]
+            ) + "]"
+
+
+def root(array):
+    """
+    Return the array that owns the memory array is a view of
+    """
+    while isinstance(array.base, numpy.ndarray):
+        array = array.base
+    return array
@@ -0,0 +1,104 @@
+"""
+Renders variables for display
+
+Output is produced a few rows at a time while it is written, so displaying
+a large matrix never builds one string holding all of it. Arrays of more
+than limit elements are cut down to their first and last edge rows and
+columns, followed by a summary line.
+"""
+from __future__ import unicode_literals
+from operators import is_array
+import numpy
+import os
+
+spacer = "    "
+# formatting a block of rows at a time keeps the work vectorized
+block_size = 1 << 12
+
+
+def format_numbers(values):
+    """
+    Format an array of floats the way str formats each of them
+    """
+    text = numpy.char.mod(str('%.12g'), values)
+    whole = (
+        numpy.char.count(text, str('.')) +
+        numpy.char.count(text, str('e')) +
+        numpy.char.count(text, str('n'))
+    ) == 0
+    if whole.any():
+        text = numpy.char.add(text, numpy.where(whole, str('.0'), str('')))
+        # str switches to an exponent for whole numbers of 12 digits
+        length = numpy.char.str_len(text) - numpy.signbit(values)
+        wide = whole & (length > 13)
+        if wide.any():
+            text = text.astype(object)
+        for index in zip(*numpy.nonzero(wide)):
+            text[index] = "{}".format(float(values[index]))
+    return text
+
+
+class Display(object):
+    """
+    The text displaying a variable, rendered as it is iterated over
+    """
+
+    def __init__(self, name, value, limit=None, edge=5):
+        self.name = name
+        self.value = value
+        self.limit = limit
+        self.edge = edge
+
+    def __iter__(self):
+        value = self.value
+        heading = "{} {} =".format(os.linesep, self.name)
+        if not is_array(value):
+            yield heading + " {}".format(value) + os.linesep
+            return
+        if not value.size:
+            yield heading + " []" + os.linesep
+            return
+        yield heading + os.linesep
+
+        rows, columns = value.shape
+        edge = self.edge
+        if self.limit is None or value.size <= self.limit \
+                or rows <= 2 * edge and columns <= 2 * edge:
+            for line in self.lines(value):
+                yield line
+            return
+
+        elided = []
+        if columns > 2 * edge:
+            value = numpy.hstack((value[:, :edge], value[:, -edge:]))
+            elided.append("columns")
+        if rows > 2 * edge:
+            for line in self.lines(value[:edge], columns > 2 * edge):
+                yield line
+            yield spacer + "..." + os.linesep
+            value = value[-edge:]
+            elided.insert(0, "rows")
+        for line in self.lines(value, columns > 2 * edge):
+            yield line
+        yield " [{}x{} {}, first and last {} {} shown]{}".format(
+            rows, columns, self.value.dtype, edge, " and ".join(elided),
+            os.linesep
+        )
+
+    def lines(self, value, elided=False):
+        """
+        Yield a line for every row of value. If elided the middle columns
+        were left out, which is marked between the two halves
+        """
+        rows, columns = value.shape
+        step = max(1, block_size // columns)
+        for start in range(0, rows, step):
+            block = format_numbers(value[start:start + step])
+            for row in block:
+                cells = list(row)
+                if elided:
+                    cells.insert(columns // 2, "...")
+                yield spacer + spacer.join(cells) + os.linesep
+
+    def __str__(self):
+        return "".join(self)
@@ -32,3 +32,12 @@ class MatlabetteRuntimeError(MatlabetteError):
 
 class InvalidArgumentsForOperator(MatlabetteError):
     pass
+
+
+class JobCancelled(BaseException):
+    """
+    Raised in the worker thread to stop the running job, at the next
+    operation after the context's cancelled flag is set. It is not an
+    Exception, so handlers turning errors into runtime errors let it pass
+    """
+    pass
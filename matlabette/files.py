@@ -0,0 +1,17 @@
+"""
+File helpers shared by the modules that write files
+"""
+import os
+
+
+def replace(source, destination):
+    """
+    Move source over destination, so readers see either the old file or
+    the new one
+    """
+    try:
+        os.rename(source, destination)
+    except OSError:
+        # Windows won't rename over an existing file
+        os.remove(destination)
+        os.rename(source, destination)
@@ -0,0 +1,139 @@
+"""
+Folds the constant parts of a parse tree
+
+Array literals made only of numbers, and operators applied only to
+numbers, are worked out once when the line is parsed. The node is
+replaced with a locked node holding the result, so evaluating it just
+returns the value. Folded arrays are read-only because the same array is
+returned every time the statement runs.
+"""
+from __future__ import unicode_literals
+from errors import MatlabetteError
+from operators import Operators, is_array, is_scalar
+import numpy
+
+binary_operations = {
+    u'+': Operators.add,
+    u'-': Operators.subtract,
+    u'*': Operators.multiply,
+    u'/': Operators.divide,
+    u'\\': Operators.left_divide,
+    u'.+': Operators.elem_add,
+    u'.-': Operators.elem_subtract,
+    u'.*': Operators.elem_multiply,
+    u'./': Operators.elem_divide,
+}
+unary_operations = {
+    u'\'': Operators.transpose,
+}
+
+
+def fold(parse_tree):
+    """
+    Fold parse_tree and all the nodes under it
+    :return: the folded tree
+    """
+    if parse_tree is None:
+        return None
+    if parse_tree.operator == u'call':
+        # only the arguments; their list is not an array literal
+        arguments = parse_tree.right_child.value
+        arguments[:] = [fold(argument) for argument in arguments]
+        return parse_tree
+    parse_tree.left_child = fold(parse_tree.left_child)
+    parse_tree.right_child = fold(parse_tree.right_child)
+    value = parse_tree.value
+    if isinstance(value, list):
+        for row in value:
+            if isinstance(row, list):
+                row[:] = [fold(cell) for cell in row]
+        if not (value and isinstance(value[0], list)):
+            value[:] = [
+                fold(node) if not isinstance(node, list) else node
+                for node in value
+            ]
+
+    try:
+        result = evaluate(parse_tree)
+    except (MatlabetteError, ArithmeticError, ValueError):
+        # left for evaluation to report
+        return parse_tree
+    if result is None:
+        return parse_tree
+    if is_array(result):
+        result.setflags(write=False)
+    parse_tree.operator = None
+    parse_tree.left_child = None
+    parse_tree.right_child = None
+    parse_tree.value = result
+    parse_tree.locked = True
+    return parse_tree
+
+
+def constant(parse_tree):
+    """
+    Return the number or folded array at parse_tree, or None
+    """
+    if parse_tree is None or parse_tree.operator is not None:
+        return None
+    value = parse_tree.value
+    if is_scalar(value) or is_array(value) and parse_tree.locked:
+        return value
+    if value is None and parse_tree.left_child \
+            and not parse_tree.right_child:
+        return constant(parse_tree.left_child)
+    return None
+
+
+def evaluate(parse_tree):
+    """
+    Return the value of parse_tree if it only involves numbers, or None
+    """
+    op = parse_tree.operator
+    value = parse_tree.value
+    if op is None:
+        if parse_tree.locked:
+            return None
+        if value is None:
+            return constant(parse_tree.left_child) \
+                if not parse_tree.right_child else None
+        if isinstance(value, list):
+            return array(value)
+        return None
+
+    if value is not None:
+        if op not in unary_operations:
+            return None
+        if is_array(value) and parse_tree.locked:
+            operand = value
+        elif isinstance(value, list) and value \
+                and isinstance(value[0], list):
+            operand = array(value)
+        else:
+            operand = None
+        if operand is None:
+            return None
+        return unary_operations[op](operand)
+
+    if op not in binary_operations:
+        return None
+    left = constant(parse_tree.left_child)
+    right = constant(parse_tree.right_child)
+    if left is None or right is None:
+        return None
+    return binary_operations[op](left, right)
+
+
+def array(rows):
+    """
+    Build an array literal whose cells are all numbers, or return None
+    """
+    if not rows:
+        return numpy.empty((0, 0))
+    if not isinstance(rows[0], list) \
+            or any(len(row) != len(rows[0]) for row in rows):
+        return None
+    values = [constant(cell) for row in rows for cell in row]
+    if not all(is_scalar(value) for value in values):
+        return None
+    return numpy.array(values, dtype=float).reshape(len(rows), len(rows[0]))
@@ -0,0 +1,153 @@
+"""
+Fused evaluation of element-wise expressions
+
+An expression such as a .* b + c - d .* 2 is normally evaluated one
+operator at a time, each step making a full-size temporary array. A
+FusedExpression evaluates the whole expression over one block of the
+arrays at a time instead, small enough to stay in cache, writing
+intermediate results into a few block-sized buffers that are reused for
+every block.
+"""
+from __future__ import unicode_literals
+from errors import MatlabetteRuntimeError, InvalidArgumentsForOperator
+from operators import is_array, is_scalar
+import numpy
+
+ufuncs = {
+    u'+': numpy.add,
+    u'-': numpy.subtract,
+    u'.+': numpy.add,
+    u'.-': numpy.subtract,
+    u'.*': numpy.multiply,
+    u'./': numpy.divide,
+    # element-wise only when an operand is a scalar, checked when run
+    u'*': numpy.multiply,
+    u'/': numpy.divide,
+}
+
+
+class FusedExpression(object):
+    """
+    Evaluates a tree of element-wise operators
+
+    leaves are the compiled operands, left to right. program lists the
+    operators in evaluation order as (op, action, left, right), where left
+    and right index the operand values: the leaves first, then the results
+    of earlier steps. The last step gives the result.
+
+    Leaves are evaluated one at a time, checking each step as soon as its
+    operands are known. Once one can't be fused, the rest is evaluated in
+    the tree-walker's order, so it fails with the same error.
+    """
+    # elements per block
+    block_size = 1 << 15
+    # smaller results are evaluated an operator at a time
+    min_size = 1 << 17
+
+    def __init__(self, leaves, program):
+        self.leaves = leaves
+        self.program = program
+        # the number of leaves each step needs evaluated before it
+        self.ready = []
+        for op, action, left, right in program:
+            self.ready.append(max(self.needs(left), self.needs(right)))
+
+    def needs(self, index):
+        if index < len(self.leaves):
+            return index + 1
+        return self.ready[index - len(self.leaves)]
+
+    def __call__(self):
+        leaf_count = len(self.leaves)
+        values = [None] * (leaf_count + len(self.program))
+        scalars = list(values)
+        shape = None
+        step = 0
+        for index, leaf in enumerate(self.leaves):
+            value = values[index] = leaf()
+            if is_array(value):
+                if shape is None:
+                    shape = value.shape
+                elif value.shape != shape:
+                    return self.evaluate(values, index + 1)
+            elif not is_scalar(value):
+                return self.evaluate(values, index + 1)
+            scalars[index] = not is_array(value)
+            while step < len(self.program) \
+                    and self.ready[step] == index + 1:
+                op, action, left, right = self.program[step]
+                if op == u'*' and not (scalars[left] or scalars[right]) \
+                        or op == u'/' and not scalars[right]:
+                    return self.evaluate(values, index + 1)
+                scalars[leaf_count + step] = scalars[left] and scalars[right]
+                step += 1
+        if shape is None or len(shape) != 2 \
+                or shape[0] * shape[1] < self.min_size:
+            return self.evaluate(values, leaf_count)
+        return self.evaluate_blocks(values, scalars, shape)
+
+    def evaluate(self, values, evaluated):
+        """
+        Apply the operators one at a time, as the tree-walker would,
+        evaluating the leaves after the first evaluated ones as they are
+        needed
+        """
+        values = list(values)
+        leaf_count = len(self.leaves)
+        for step, (op, action, left, right) in enumerate(self.program):
+            while evaluated < self.ready[step]:
+                values[evaluated] = self.leaves[evaluated]()
+                evaluated += 1
+            try:
+                values[leaf_count + step] = action(
+                    values[left], values[right]
+                )
+            except InvalidArgumentsForOperator:
+                raise MatlabetteRuntimeError(
+                    "Invalid arguments for operator {}".format(op)
+                )
+        return values[-1]
+
+    def evaluate_blocks(self, values, scalars, shape):
+        rows, columns = shape
+        block_columns = min(columns, self.block_size)
+        block_rows = max(1, self.block_size // block_columns)
+        leaf_count = len(self.leaves)
+        values = values[:leaf_count]
+
+        # steps on scalars only are worked out once, up front
+        steps = []
+        for step, (op, action, left, right) in enumerate(self.program):
+            if scalars[leaf_count + step]:
+                values.append(action(values[left], values[right]))
+            else:
+                values.append(None)
+                steps.append((ufuncs[op], left, right, leaf_count + step))
+        buffers = [
+            numpy.empty((block_rows, block_columns)) for _ in steps[:-1]
+        ]
+        arrays = [
+            index for index in range(leaf_count) if not scalars[index]
+        ]
+        leaves = values[:leaf_count]
+
+        result = numpy.empty(shape)
+        for row in range(0, rows, block_rows):
+            row_end = min(row + block_rows, rows)
+            for column in range(0, columns, block_columns):
+                column_end = min(column + block_columns, columns)
+                for index in arrays:
+                    values[index] = \
+                        leaves[index][row:row_end, column:column_end]
+                for buffer, (ufunc, left, right, target) \
+                        in zip(buffers, steps):
+                    values[target] = ufunc(
+                        values[left], values[right],
+                        out=buffer[:row_end - row, :column_end - column]
+                    )
+                ufunc, left, right, _ = steps[-1]
+                ufunc(
+                    values[left], values[right],
+                    out=result[row:row_end, column:column_end]
+                )
+        return result
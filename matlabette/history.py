@@ -0,0 +1,62 @@
+"""
+Reads and compacts the history file written by the prompt
+
+Each entry in the file is a comment line with the time it was entered
+followed by its lines, each prefixed with '+'. The file is only ever
+appended to by the prompt, so it is compacted when the REPL starts to keep
+the most recent max_entries entries.
+"""
+from __future__ import unicode_literals
+from files import replace
+import os
+
+
+def read_blocks(filename):
+    """
+    Return the raw lines of each entry in the history file
+    """
+    blocks = []
+    block = None
+    with open(filename, 'rb') as f:
+        for line in f:
+            line = line.decode('utf-8')
+            if line.startswith('#'):
+                block = [line]
+                blocks.append(block)
+            elif line.startswith('+'):
+                if block is None:
+                    block = []
+                    blocks.append(block)
+                block.append(line)
+    return [
+        block for block in blocks
+        if any(line.startswith('+') for line in block)
+    ]
+
+
+def entries(blocks):
+    """
+    Return the text of each entry
+    """
+    return [
+        "".join(line[1:] for line in block if line.startswith('+'))[:-1]
+        for block in blocks
+    ]
+
+
+def load(filename, max_entries=10000):
+    """
+    Return the entries in the history file, rewriting it first with only
+    the last max_entries of them if it has more
+    """
+    if not os.path.isfile(filename):
+        return []
+    blocks = read_blocks(filename)
+    if len(blocks) > max_entries:
+        blocks = blocks[-max_entries:]
+        temporary = filename + '.tmp'
+        with open(temporary, 'wb') as f:
+            for block in blocks:
+                f.write(("\n" + "".join(block)).encode('utf-8'))
+        replace(temporary, filename)
+    return entries(blocks)
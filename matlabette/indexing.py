@@ -0,0 +1,130 @@
+"""
+MATLAB style indexing of arrays
+
+Indices start at 1. A single index, or a range of them with a constant
+step, becomes a slice, so reading with it returns a view of the array
+rather than a copy. Other index vectors select a copy. With one index a
+matrix is indexed in column-major order, as MATLAB does, and a vector
+along its length.
+"""
+from __future__ import unicode_literals
+from errors import MatlabetteRuntimeError
+from operators import is_array, is_scalar, is_value
+import numpy
+
+ALL = slice(None)
+
+
+def positions(index, size):
+    """
+    Convert an index into 0-based positions along a dimension of size
+    :return: a slice where possible, otherwise an array of positions
+    """
+    if isinstance(index, slice):
+        return ALL
+    if is_scalar(index):
+        values = numpy.array([index])
+    elif is_array(index):
+        values = index.ravel()
+    else:
+        raise MatlabetteRuntimeError("Invalid index")
+    if not values.size:
+        return slice(0, 0)
+    if not numpy.isfinite(values).all() \
+            or (values != numpy.floor(values)).any() or values.min() < 1:
+        raise MatlabetteRuntimeError(
+            "Subscript indices must be positive integers"
+        )
+    if values.max() > size:
+        raise MatlabetteRuntimeError("Index exceeds matrix dimensions")
+    integers = values.astype(int) - 1
+    if integers.size == 1:
+        return slice(integers[0], integers[0] + 1)
+    step = integers[1] - integers[0]
+    if step and (numpy.diff(integers) == step).all():
+        stop = integers[-1] + step
+        return slice(integers[0], stop if stop >= 0 else None, step)
+    return integers
+
+
+def count(position, size):
+    if isinstance(position, slice):
+        return len(range(*position.indices(size)))
+    return len(position)
+
+
+def key(value, indices):
+    """
+    Return what to index value with in numpy for the MATLAB indices, and
+    the shape of the result
+    """
+    rows, columns = value.shape
+    if len(indices) == 2:
+        row = positions(indices[0], rows)
+        column = positions(indices[1], columns)
+        shape = (count(row, rows), count(column, columns))
+        if not isinstance(row, slice) and not isinstance(column, slice):
+            return numpy.ix_(row, column), shape
+        return (row, column), shape
+    if len(indices) != 1:
+        raise MatlabetteRuntimeError("Only one or two indices are supported")
+
+    index = indices[0]
+    if rows == 1:
+        column = positions(index, columns)
+        return (ALL, column), (1, count(column, columns))
+    if columns == 1:
+        row = positions(index, rows)
+        return (row, ALL), (count(row, rows), 1)
+    position = positions(index, value.size)
+    if position is ALL:
+        return None, (value.size, 1)
+    if isinstance(position, slice):
+        position = numpy.arange(value.size)[position]
+    if is_array(index) and index.shape[0] > 1:
+        shape = (len(position), 1)
+    else:
+        shape = (1, len(position))
+    # column-major order
+    return (position % rows, position // rows), shape
+
+
+def read(value, indices):
+    """
+    Return the part of value at indices, a view where possible
+    """
+    if is_scalar(value):
+        value = numpy.array([[value]])
+    if not is_array(value):
+        raise MatlabetteRuntimeError("Only arrays can be indexed")
+    where, shape = key(value, indices)
+    if where is None:
+        result = value.reshape(shape, order='F')
+    else:
+        result = value[where].reshape(shape)
+    if all(is_scalar(index) for index in indices):
+        return float(result[0, 0])
+    return result
+
+
+def write(value, indices, rhs):
+    """
+    Set the part of the array value at indices to rhs, in place
+    """
+    if not is_value(rhs):
+        raise MatlabetteRuntimeError("Invalid value for assignment")
+    where, shape = key(value, indices)
+    if is_array(rhs):
+        if rhs.size != shape[0] * shape[1]:
+            raise MatlabetteRuntimeError(
+                "Subscripted assignment dimension mismatch"
+            )
+        rhs = rhs.reshape(shape, order='F')
+    if where is None:
+        value.T[...] = rhs.reshape(value.T.shape) if is_array(rhs) else rhs
+    elif len(where) == 2 and not isinstance(where[0], slice) \
+            and not isinstance(where[1], slice) and where[0].ndim == 1:
+        # a linear index into a matrix selects single elements
+        value[where] = rhs.ravel(order='F') if is_array(rhs) else rhs
+    else:
+        value[where] = rhs
@@ -0,0 +1,172 @@
+"""
+Runs statements on a worker thread
+
+The REPL hands each statement to a JobQueue and waits for it, unless it
+was sent to the background, so a long computation never holds up the
+prompt for longer than the user chooses to wait. Jobs run one at a time
+in the order they were given, since they share the variables.
+
+A running job is cancelled by setting the cancelled flag of the context
+it runs in. Compiled statements check it before each operation and raise
+JobCancelled, so a statement stops between operations and never between
+changing a variable and recording the change. A single long numpy call,
+such as inverting a large matrix, finishes before the job stops.
+"""
+from __future__ import unicode_literals
+from collections import deque
+from errors import MatlabetteError, JobCancelled
+from display import Display
+import threading
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class Job(object):
+    """
+    A statement waiting for, or given, its turn on the worker thread
+    """
+
+    def __init__(self, number, line, statement, background):
+        self.number = number
+        self.line = line
+        self.statement = statement
+        self.background = background
+        self.state = QUEUED
+        self.cancelling = False
+        self.output = None
+        self.error = None
+        # whether the prompt has said it finished
+        self.reported = False
+        self.finished = threading.Event()
+
+    def run(self):
+        output = self.statement()
+        if self.background and isinstance(output, Display):
+            # rendered now, as the variable may change before it is shown
+            output = "".join(output)
+        self.output = output
+
+
+class JobQueue(object):
+    """
+    Runs jobs one at a time on a worker thread
+    """
+    # seconds between checks while waiting, so Ctrl+C gets through
+    poll_interval = 0.1
+
+    def __init__(self, context):
+        # the context the jobs run in, which is told to stop the running one
+        self.context = context
+        self.pending = deque()
+        # background jobs, until their output has been shown
+        self.jobs = []
+        self.running = None
+        self.count = 0
+        self.condition = threading.Condition()
+        self.worker = threading.Thread(target=self.work, name='jobs')
+        self.worker.daemon = True
+        self.worker.start()
+
+    def submit(self, line, statement, background=False):
+        """
+        Queue statement, the prepared form of line, and return its job
+        """
+        with self.condition:
+            # only background jobs are numbered, for the job commands
+            number = None
+            if background:
+                self.count += 1
+                number = self.count
+            job = Job(number, line, statement, background)
+            if background:
+                self.jobs.append(job)
+            self.pending.append(job)
+            self.condition.notify()
+        return job
+
+    def find(self, number):
+        for job in self.jobs:
+            if job.number == number:
+                return job
+        return None
+
+    def work(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                job = self.pending.popleft()
+                job.state = RUNNING
+                self.running = job
+                self.context.cancelled = False
+            self.run(job)
+
+    def run(self, job):
+        try:
+            job.run()
+            job.state = DONE
+        except JobCancelled:
+            job.state = CANCELLED
+        except MatlabetteError as e:
+            job.error = e.message
+            job.state = FAILED
+        except BaseException as e:
+            # anything else, even a KeyboardInterrupt from a command, fails
+            # the job rather than ending the worker
+            job.error = "{}".format(e) or type(e).__name__
+            job.state = FAILED
+        with self.condition:
+            self.running = None
+            # a cancel that came too late to stop the job
+            self.context.cancelled = False
+            self.condition.notify_all()
+        job.finished.set()
+
+    def cancel(self, job):
+        """
+        Take job off the queue, or stop it if it is running
+        :return: whether job was still to finish
+        """
+        with self.condition:
+            if job.state == QUEUED:
+                self.pending.remove(job)
+                job.state = CANCELLED
+                job.finished.set()
+                return True
+            if job is self.running and not job.cancelling:
+                job.cancelling = True
+                self.context.cancelled = True
+                return True
+        return False
+
+    def wait(self, job=None):
+        """
+        Wait for job to finish, or for every job if job is None
+        """
+        # waiting without a timeout can't be interrupted on Python 2
+        if job is not None:
+            while not job.finished.wait(self.poll_interval):
+                pass
+            return
+        with self.condition:
+            while self.pending or self.running is not None:
+                self.condition.wait(self.poll_interval)
+
+    def cancel_running(self):
+        running = self.running
+        if running is not None:
+            self.cancel(running)
+
+    def cancel_all(self):
+        """
+        Take every job off the queue and stop the running one
+        """
+        with self.condition:
+            jobs = list(self.pending)
+        for job in jobs:
+            self.cancel(job)
+        self.cancel_running()
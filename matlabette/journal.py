@@ -0,0 +1,189 @@
+"""
+Append-only journal for the default workspace
+
+Saving appends only the variables changed since the last save to
+<workspace>.journal. When the journal grows larger than the workspace
+(and at least compact_size) it is compacted: the whole workspace is
+written again and the journal removed. Appending is only right when the
+context already holds everything in the snapshot and journal, so a save
+from a context that wasn't loaded from them, or that they have changed
+under since, compacts instead.
+
+Journal layout:
+
+    magic        8 bytes, b'MLTBJN01'
+    header size  8 bytes, little-endian unsigned
+    header       JSON: {"snapshot": [size, mtime]} of the workspace file
+                 the journal applies to
+    records      header size, JSON {"name", "shape"} and float64 data,
+                 each part starting on a 64 byte boundary
+"""
+from __future__ import unicode_literals
+from functools import partial
+from operators import is_array
+import workspace
+import json
+import numpy
+import os
+import struct
+
+MAGIC = b'MLTBJN01'
+
+
+class Journal(object):
+
+    compact_size = 16 << 20
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.path = snapshot + '.journal'
+        # the state of the files when the context was last loaded from or
+        # saved to them
+        self.synced = None
+
+    def snapshot_token(self):
+        """
+        Identify the current snapshot, so a journal written against an
+        older one is never replayed over a newer one
+        """
+        if not os.path.isfile(self.snapshot):
+            return None
+        stat = os.stat(self.snapshot)
+        return [stat.st_size, stat.st_mtime]
+
+    def is_valid(self):
+        """
+        Check that the journal exists and applies to the current snapshot
+        """
+        token = self.snapshot_token()
+        if token is None or not os.path.isfile(self.path):
+            return False
+        with open(self.path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return False
+            size, = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(size).decode('utf-8'))
+        return header['snapshot'] == token
+
+    def state(self):
+        """
+        Identify the snapshot and how much of the journal there is, or
+        return None if the journal isn't valid
+        """
+        if not self.is_valid():
+            return None
+        return self.snapshot_token(), os.path.getsize(self.path)
+
+    def load(self, context, run_line):
+        """
+        Load the snapshot then replay the journal over it. The loaded
+        variables are not dirty
+        """
+        names = workspace.load(self.snapshot, context, run_line)
+        if self.is_valid():
+            for entry in self.records():
+                context.defer(
+                    entry['name'],
+                    partial(workspace.read_entry, self.path, entry, 0)
+                )
+                names.append(entry['name'])
+        context.dirty.difference_update(names)
+        self.synced = self.state()
+
+    def records(self):
+        """
+        Yield the index entry of every complete record, oldest first
+        """
+        size = os.path.getsize(self.path)
+        with open(self.path, 'rb') as f:
+            f.seek(len(MAGIC))
+            header_size, = struct.unpack('<Q', f.read(8))
+            position = workspace.align(len(MAGIC) + 8 + header_size)
+            while position + 8 <= size:
+                f.seek(position)
+                header_size, = struct.unpack('<Q', f.read(8))
+                try:
+                    entry = json.loads(f.read(header_size).decode('utf-8'))
+                except ValueError:
+                    break
+                offset = workspace.align(position + 8 + header_size)
+                count = int(numpy.prod(entry['shape'])) \
+                    if entry['shape'] else 1
+                end = offset + count * workspace.dtype.itemsize
+                if end > size:
+                    # the last save was interrupted
+                    break
+                entry['offset'] = offset
+                yield entry
+                position = workspace.align(end)
+
+    def save(self, context):
+        """
+        Append the dirty variables, compacting when the journal is too big
+        or the context isn't in step with it
+        """
+        if self.synced is None or self.synced != self.state():
+            return self.compact(context)
+        position = os.path.getsize(self.path)
+        with open(self.path, 'ab') as f:
+            for name in sorted(context.dirty):
+                position = self.write_record(
+                    f, position, name, context.dereference(name)
+                )
+        context.dirty.clear()
+        self.synced = self.state()
+        snapshot_size = os.path.getsize(self.snapshot)
+        if position > max(self.compact_size, snapshot_size):
+            self.compact(context)
+
+    def compact(self, context, binary=None):
+        """
+        Write the whole workspace as the snapshot and start a new journal.
+        The snapshot keeps its format unless binary is given
+        """
+        if binary is None:
+            binary = os.path.isfile(self.snapshot) \
+                and workspace.is_binary(self.snapshot)
+        workspace.save(self.snapshot, context, binary)
+        self.reset()
+        context.dirty.clear()
+        self.synced = self.state()
+
+    def reset(self):
+        """
+        Start a new journal against the current snapshot. The old file is
+        unlinked rather than truncated so arrays mapped from it stay valid
+        """
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+        header = json.dumps({'snapshot': self.snapshot_token()})
+        header = header.encode('utf-8')
+        with open(self.path, 'wb') as f:
+            self.write_padded(f, 0, [
+                MAGIC, struct.pack('<Q', len(header)), header
+            ])
+
+    def write_record(self, f, position, name, value):
+        array = numpy.ascontiguousarray(value, dtype=workspace.dtype)
+        header = json.dumps({
+            'name': name,
+            'shape': list(array.shape) if is_array(value) else [],
+        }).encode('utf-8')
+        position = self.write_padded(f, position, [
+            struct.pack('<Q', len(header)), header
+        ])
+        workspace.write_array(f, array)
+        return self.write_padded(f, position + array.nbytes, [])
+
+    @staticmethod
+    def write_padded(f, position, parts):
+        """
+        Write parts then pad to the next boundary
+        :return: the position after the padding
+        """
+        for part in parts:
+            f.write(part)
+            position += len(part)
+        end = workspace.align(position)
+        f.write(b'\0' * (end - position))
+        return end
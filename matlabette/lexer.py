@@ -2,16 +2,7 @@
 Converts text to tokens to be consumed by the parser
 """
 from __future__ import unicode_literals
-from pygments import lex
-from pygments.lexers.matlab import MatlabLexer
-from pygments.token import (
-    Text,
-    Punctuation,
-    Operator,
-    Literal,
-    Name,
-    Token as PygmentsToken
-)
+import re
 
 
 class Token(object):
@@ -22,52 +13,131 @@ class Token(object):
     RIGHT_SQUARE_BRACKET = 'RIGHT_SQUARE_BRACKET'
     COMMA = 'COMMA'
     SEMI_COLON = 'SEMI_COLON'
+    COLON = 'COLON'
     ASSIGN_OPERATOR = 'ASSIGN_OPERATOR'
     ADD_OPERATOR = 'ADD_OPERATOR'
     SUBTRACT_OPERATOR = 'SUBTRACT_OPERATOR'
     MULTIPLY_OPERATOR = 'MULTIPLY_OPERATOR'
     DIVIDE_OPERATOR = 'DIVIDE_OPERATOR'
+    LEFT_DIVIDE_OPERATOR = 'LEFT_DIVIDE_OPERATOR'
     ELEM_ADD_OPERATOR = 'ELEM_ADD_OPERATOR'
     ELEM_SUBTRACT_OPERATOR = 'ELEM_SUBTRACT_OPERATOR'
     ELEM_MULTIPLY_OPERATOR = 'ELEM_MULTIPLY_OPERATOR'
     ELEM_DIVIDE_OPERATOR = 'ELEM_DIVIDE_OPERATOR'
     TRANSPOSE_OPERATOR = 'TRANSPOSE_OPERATOR'
-    INTEGER_LITERAL = Literal.Number.Integer
-    FLOAT_LITERAL = Literal.Number.Float
-    VARIABLE_NAME = Name
-    BUILTIN_NAME = PygmentsToken.Name.Builtin
+    INTEGER_LITERAL = 'INTEGER_LITERAL'
+    FLOAT_LITERAL = 'FLOAT_LITERAL'
+    STRING_LITERAL = 'STRING_LITERAL'
+    VARIABLE_NAME = 'VARIABLE_NAME'
+    BUILTIN_NAME = 'BUILTIN_NAME'
+    KEYWORD = 'KEYWORD'
+    UNKNOWN = 'UNKNOWN'
 
 
 class Lexer(object):
     token_map = {
-        (Text, u'\n'): Token.END_OF_LINE,
-        (Punctuation, u','): Token.COMMA,
-        (Punctuation, u';'): Token.SEMI_COLON,
-        (Punctuation, u'['): Token.LEFT_SQUARE_BRACKET,
-        (Punctuation, u']'): Token.RIGHT_SQUARE_BRACKET,
-        (Punctuation, u'('): Token.LEFT_PARENTHESIS,
-        (Punctuation, u')'): Token.RIGHT_PARENTHESIS,
-        (Punctuation, u'='): Token.ASSIGN_OPERATOR,
-        (Operator, u'+'): Token.ADD_OPERATOR,
-        (Operator, u'*'): Token.MULTIPLY_OPERATOR,
-        (Operator, u'-'): Token.SUBTRACT_OPERATOR,
-        (Operator, u'/'): Token.DIVIDE_OPERATOR,
-        (Operator, u'.+'): Token.ELEM_ADD_OPERATOR,
-        (Operator, u'.*'): Token.ELEM_MULTIPLY_OPERATOR,
-        (Operator, u'.-'): Token.ELEM_SUBTRACT_OPERATOR,
-        (Operator, u'./'): Token.ELEM_DIVIDE_OPERATOR,
-        (Operator, u'\''): Token.TRANSPOSE_OPERATOR,
+        u'\n': Token.END_OF_LINE,
+        u',': Token.COMMA,
+        u';': Token.SEMI_COLON,
+        u':': Token.COLON,
+        u'[': Token.LEFT_SQUARE_BRACKET,
+        u']': Token.RIGHT_SQUARE_BRACKET,
+        u'(': Token.LEFT_PARENTHESIS,
+        u')': Token.RIGHT_PARENTHESIS,
+        u'=': Token.ASSIGN_OPERATOR,
+        u'+': Token.ADD_OPERATOR,
+        u'*': Token.MULTIPLY_OPERATOR,
+        u'-': Token.SUBTRACT_OPERATOR,
+        u'/': Token.DIVIDE_OPERATOR,
+        u'\\': Token.LEFT_DIVIDE_OPERATOR,
+        u'.+': Token.ELEM_ADD_OPERATOR,
+        u'.*': Token.ELEM_MULTIPLY_OPERATOR,
+        u'.-': Token.ELEM_SUBTRACT_OPERATOR,
+        u'./': Token.ELEM_DIVIDE_OPERATOR,
+        u'\'': Token.TRANSPOSE_OPERATOR,
     }
 
+    keywords = frozenset([
+        'break', 'case', 'catch', 'classdef', 'continue', 'else', 'elseif',
+        'end', 'enumerated', 'events', 'for', 'function', 'global', 'if',
+        'methods', 'otherwise', 'parfor', 'persistent', 'properties',
+        'return', 'spmd', 'switch', 'try', 'while'
+    ])
+
+    # One alternative per token class. The order matters: floats before
+    # integers, and a quote right after a name, a number, a closing
+    # bracket or another quote is a transpose rather than a string.
+    pattern = re.compile(r"""
+        (?P<skip>[ \t\r\f\v]+|%[^\n]*)
+      | (?P<end_of_line>\n)
+      | (?P<float>
+            \d*\.\d+(?:[eE][+-]?\d+)?
+          | \d+\.(?![*/\\^+-])(?:[eE][+-]?\d+)?
+          | \d+[eE][+-]?\d+)
+      | (?P<integer>\d+)
+      | (?P<name>[a-zA-Z_]\w*)
+      | (?P<transpose>(?<=[\w)\]'.])')
+      | (?P<string>'[^'\n]*')
+      | (?P<symbol>\.[*/\\^+-]|[-+*/\\^\[\](),;=:])
+      | (?P<unknown>.)
+    """, re.VERBOSE | re.UNICODE)
+
     @classmethod
     def lex(cls, line):
+        if not isinstance(line, unicode):
+            line = line.decode('utf-8')
+        # like pygments, drop surrounding new lines and end with exactly one
+        line = line.strip('\n') + '\n'
+        token_map = cls.token_map
+        keywords = cls.keywords
+        tokens = []
+        append = tokens.append
+        for match in cls.pattern.finditer(line):
+            kind = match.lastgroup
+            value = match.group()
+            if kind == 'symbol' or kind == 'end_of_line' \
+                    or kind == 'transpose':
+                append((token_map.get(value, Token.UNKNOWN), value))
+            elif kind == 'name':
+                if value in keywords:
+                    append((Token.KEYWORD, value))
+                else:
+                    append((Token.VARIABLE_NAME, value))
+            elif kind == 'integer':
+                append((Token.INTEGER_LITERAL, value))
+            elif kind == 'float':
+                append((Token.FLOAT_LITERAL, value))
+            elif kind == 'string':
+                append((Token.STRING_LITERAL, value))
+            elif kind == 'unknown':
+                append((Token.UNKNOWN, value))
+        return tokens
+
+    @classmethod
+    def pygments_lex(cls, line):
+        """
+        Tokenizes line with the Pygments MATLAB lexer. Slower than lex, kept
+        for comparison.
+        """
+        from pygments import lex
+        from pygments.lexers.matlab import MatlabLexer
+        from pygments.token import Text, Punctuation, Operator, Literal, Name
+
+        type_map = {
+            Literal.Number.Integer: Token.INTEGER_LITERAL,
+            Literal.Number.Float: Token.FLOAT_LITERAL,
+            Name: Token.VARIABLE_NAME,
+            Name.Builtin: Token.BUILTIN_NAME,
+        }
         tokens = lex(line, MatlabLexer())
         # remove all whitespace except new line at the end
         tokens = filter(
             lambda _token: _token[0] != Text or _token[1] == u'\n',
             tokens
         )
-        return [
-            (cls.token_map.get(token, token[0]), token[1])
-            for token in tokens
-        ]
+        result = []
+        for token_type, value in tokens:
+            if token_type in (Text, Punctuation, Operator):
+                token_type = cls.token_map.get(value, token_type)
+            result.append((type_map.get(token_type, token_type), value))
+        return result
@@ -0,0 +1,124 @@
+"""
+Solves linear systems for the matrix division operators
+
+A \\ b is solved by factorizing A rather than inverting it: Cholesky when
+A is symmetric positive definite, LU when it is square, and QR (or least
+squares when A is rank deficient) when it is not square. The
+factorizations come from scipy.linalg when it is installed, as the fast
+extra; without it square systems are handed to numpy.linalg.solve, which
+factorizes A again on every call, so there is nothing worth caching.
+"""
+from __future__ import unicode_literals
+from errors import MatlabetteRuntimeError
+import numpy
+
+_scipy_linalg = []
+
+
+def scipy_linalg():
+    """
+    Return scipy.linalg, or None if scipy is not installed. It is only
+    imported the first time a system is solved
+    """
+    if not _scipy_linalg:
+        try:
+            import scipy.linalg
+            _scipy_linalg.append(scipy.linalg)
+        except ImportError:
+            _scipy_linalg.append(None)
+    return _scipy_linalg[0]
+
+
+class Factorization(object):
+    """
+    A factorized matrix that systems with any right hand side can be
+    solved against
+    """
+
+    def __init__(self, kind, factors, shape):
+        self.kind = kind
+        self.factors = factors
+        self.shape = shape
+
+    @property
+    def reusable(self):
+        """
+        Whether solving against this skips any work. solve and lstsq only
+        keep a reference to the matrix and start again every time
+        """
+        return self.kind not in ('solve', 'lstsq')
+
+    @property
+    def nbytes(self):
+        if not self.reusable:
+            return 0
+        return sum(
+            factor.nbytes for factor in self.factors
+            if isinstance(factor, numpy.ndarray)
+        )
+
+    def solve(self, rhs):
+        scipy = scipy_linalg()
+        if self.kind == 'cholesky':
+            return scipy.cho_solve(self.factors, rhs)
+        if self.kind == 'lu':
+            return scipy.lu_solve(self.factors, rhs)
+        if self.kind == 'solve':
+            return numpy.linalg.solve(self.factors[0], rhs)
+        if self.kind == 'qr':
+            q, r = self.factors
+            if scipy is None:
+                return numpy.linalg.solve(r, q.T.dot(rhs))
+            return scipy.solve_triangular(r, q.T.dot(rhs))
+        return numpy.linalg.lstsq(self.factors[0], rhs)[0]
+
+
+def factorize(matrix):
+    """
+    Factorize matrix for solve
+    """
+    rows, columns = matrix.shape
+    scipy = scipy_linalg()
+    if rows == columns:
+        if scipy is None:
+            # numpy has no separate LU step; solve factorizes every time
+            return Factorization('solve', (matrix,), matrix.shape)
+        if numpy.array_equal(matrix, matrix.T) \
+                and numpy.all(numpy.diag(matrix) > 0):
+            try:
+                return Factorization(
+                    'cholesky', scipy.cho_factor(matrix), matrix.shape
+                )
+            except numpy.linalg.LinAlgError:
+                # not positive definite
+                pass
+        lu, pivots = scipy.lu_factor(matrix)
+        if not numpy.all(numpy.diag(lu)):
+            raise MatlabetteRuntimeError("Singular matrix")
+        return Factorization('lu', (lu, pivots), matrix.shape)
+    if rows > columns:
+        q, r = numpy.linalg.qr(matrix)
+        diagonal = numpy.abs(numpy.diag(r))
+        if diagonal.min() > diagonal.max() * rows * numpy.finfo(float).eps:
+            return Factorization('qr', (q, r), matrix.shape)
+    # rank deficient or under-determined
+    return Factorization('lstsq', (matrix,), matrix.shape)
+
+
+def solve(matrix, rhs, factorization=None):
+    """
+    Solve matrix * x = rhs, the left division matrix \\ rhs
+    """
+    factorization = factorization or factorize(matrix)
+    try:
+        return factorization.solve(rhs)
+    except numpy.linalg.LinAlgError:
+        raise MatlabetteRuntimeError("Singular matrix")
+
+
+def right_divide(lhs, matrix, factorization=None):
+    """
+    Solve x * matrix = lhs, the right division lhs / matrix. A given
+    factorization is of the transpose of matrix
+    """
+    return solve(matrix.T, lhs.T, factorization).T
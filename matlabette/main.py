@@ -1,8 +1,125 @@
 """
 Entry point
+
+    matlabette                  start the interactive prompt
+    matlabette -c STATEMENTS    run statements given on the command line
+    matlabette run [FILE]       run a script, stdin if FILE is - or missing
+    matlabette batch FILE...    run scripts in parallel
+    matlabette serve ADDRESS    serve sessions on a socket
+    matlabette connect ADDRESS  send statements from stdin to a server
 """
-from repl import Repl
+import argparse
+import sys
+
+
+def run(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['run']:
+        return run_script(argv[1:])
+    if argv[:1] == ['batch']:
+        return run_batch(argv[1:])
+    if argv[:1] == ['serve']:
+        return run_server(argv[1:])
+    if argv[:1] == ['connect']:
+        return run_client(argv[1:])
+
+    parser = argparse.ArgumentParser(
+        prog='matlabette',
+        description="A minimal REPL clone of MATLAB"
+    )
+    parser.add_argument(
+        '-c', dest='statements', metavar='STATEMENTS',
+        help="run statements, one per line, and exit"
+    )
+    parser.add_argument(
+        '--no-compile', action='store_true',
+        help="evaluate by walking the parse tree instead of compiling it"
+    )
+    args = parser.parse_args(argv)
+    if args.statements is not None:
+        from script import run_string
+        return run_string(args.statements, not args.no_compile)
+
+    from repl import Repl
+    Repl(use_compiler=not args.no_compile).loop()
+    return 0
+
+
+def run_script(argv):
+    parser = argparse.ArgumentParser(
+        prog='matlabette run',
+        description="Run a script without the interactive prompt"
+    )
+    parser.add_argument(
+        'file', nargs='?', default='-',
+        help="script to run, - for stdin (the default)"
+    )
+    parser.add_argument(
+        '--no-compile', action='store_true',
+        help="evaluate by walking the parse tree instead of compiling it"
+    )
+    args = parser.parse_args(argv)
+    from script import run_file
+    return run_file(args.file, not args.no_compile)
+
+
+def run_batch(argv):
+    parser = argparse.ArgumentParser(
+        prog='matlabette batch',
+        description="Run scripts in parallel, writing their output in order"
+    )
+    parser.add_argument('files', nargs='+', metavar='FILE')
+    parser.add_argument(
+        '--jobs', type=int, default=None,
+        help="worker processes (default: one per CPU)"
+    )
+    parser.add_argument(
+        '--save-dir', metavar='DIR',
+        help="save the variables each script leaves to DIR/<script>.mlw"
+    )
+    parser.add_argument(
+        '--no-compile', action='store_true',
+        help="evaluate by walking the parse tree instead of compiling it"
+    )
+    args = parser.parse_args(argv)
+    from batch import run_files
+    return run_files(
+        args.files, args.jobs, args.save_dir, not args.no_compile
+    )
+
+
+def add_address_arguments(parser):
+    address = parser.add_mutually_exclusive_group(required=True)
+    address.add_argument(
+        '--socket', metavar='PATH', help="Unix domain socket"
+    )
+    address.add_argument(
+        '--port', type=int, help="TCP port on localhost"
+    )
+
+
+def run_server(argv):
+    parser = argparse.ArgumentParser(
+        prog='matlabette serve',
+        description="Serve sessions, each with its own variables"
+    )
+    add_address_arguments(parser)
+    parser.add_argument(
+        '--processes', type=int, default=None,
+        help="processes for heavy matrix work, 0 for none "
+             "(default: one per CPU)"
+    )
+    args = parser.parse_args(argv)
+    from server import serve
+    return serve(args.socket, args.port, args.processes)
 
 
-def run():
-    Repl().loop()
+def run_client(argv):
+    parser = argparse.ArgumentParser(
+        prog='matlabette connect',
+        description="Send statements from stdin to a server"
+    )
+    add_address_arguments(parser)
+    args = parser.parse_args(argv)
+    from client import connect
+    return connect(args.socket, args.port)
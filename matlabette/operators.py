@@ -2,65 +2,86 @@
 Operators
 """
 from errors import InvalidArgumentsForOperator, MatlabetteRuntimeError
+import linalg
 import numpy
 
 
+def is_array(value):
+    return isinstance(value, numpy.ndarray)
+
+
+def is_scalar(value):
+    return isinstance(value, float)
+
+
+def is_value(value):
+    return isinstance(value, (float, numpy.ndarray))
+
+
+def is_matrix(value):
+    """
+    Check for an array that matrix division solves against, rather than
+    divides element-wise by
+    """
+    return is_array(value) and value.size > 1
+
+
 class Operators(object):
 
     @staticmethod
     def add(lhs, rhs):
-        if isinstance(lhs, float):
-            if isinstance(rhs, float):
-                return lhs + rhs
-            if isinstance(rhs, list):
-                return (numpy.array(rhs) + lhs).tolist()
-        elif isinstance(lhs, list):
-            if isinstance(rhs, float):
-                return (numpy.array(lhs) + rhs).tolist()
-            if isinstance(rhs, list):
-                return (numpy.array(lhs) + numpy.array(rhs)).tolist()
+        if is_value(lhs) and is_value(rhs):
+            return lhs + rhs
         raise InvalidArgumentsForOperator
 
     @staticmethod
     def subtract(lhs, rhs):
-        if isinstance(lhs, float):
-            if isinstance(rhs, float):
-                return lhs - rhs
-            if isinstance(rhs, list):
-                return (numpy.array(rhs) - lhs).tolist()
-        elif isinstance(lhs, list):
-            if isinstance(rhs, float):
-                return (numpy.array(lhs) - rhs).tolist()
-            if isinstance(rhs, list):
-                return (numpy.array(lhs) - numpy.array(rhs)).tolist()
+        if is_value(lhs) and is_value(rhs):
+            return lhs - rhs
         raise InvalidArgumentsForOperator
 
     @staticmethod
     def multiply(lhs, rhs):
-        if isinstance(lhs, float):
-            if isinstance(rhs, float):
-                return lhs * rhs
-            if isinstance(rhs, list):
-                return (numpy.array(rhs) * lhs).tolist()
-        elif isinstance(lhs, list):
-            if isinstance(rhs, float):
-                return (numpy.array(lhs) * rhs).tolist()
-            if isinstance(rhs, list):
-                return (numpy.array(lhs).dot(numpy.array(rhs))).tolist()
+        if is_array(lhs) and is_array(rhs):
+            return lhs.dot(rhs)
+        if is_value(lhs) and is_value(rhs):
+            return lhs * rhs
         raise InvalidArgumentsForOperator
 
     @staticmethod
-    def divide(lhs, rhs):
-        if isinstance(lhs, float):
-            if isinstance(rhs, float):
-                return lhs / rhs
-            if isinstance(rhs, list):
-                return (numpy.array(rhs) / lhs).tolist()
-        elif isinstance(lhs, list):
-            if isinstance(rhs, float):
-                return (numpy.array(lhs) / rhs).tolist()
-            if isinstance(rhs, list):
-                return (numpy.array(lhs) / numpy.array(rhs)).tolist()
+    def divide(lhs, rhs, factorize=None):
+        """
+        :param factorize: returns the factorization of the transpose of
+        rhs, if one may already exist
+        """
+        if is_array(lhs) and is_matrix(rhs):
+            if lhs.shape[1] != rhs.shape[1]:
+                raise InvalidArgumentsForOperator
+            return linalg.right_divide(
+                lhs, rhs, factorize() if factorize else None
+            )
+        if is_matrix(rhs):
+            # a scalar over a matrix isn't defined
+            raise InvalidArgumentsForOperator
+        if is_value(lhs) and is_value(rhs):
+            return lhs / rhs
+        raise InvalidArgumentsForOperator
+
+    @staticmethod
+    def left_divide(lhs, rhs, factorize=None):
+        """
+        :param factorize: returns the factorization of lhs, if one may
+        already exist
+        """
+        if is_matrix(lhs) and is_array(rhs):
+            if lhs.shape[0] != rhs.shape[0]:
+                raise InvalidArgumentsForOperator
+            return linalg.solve(lhs, rhs, factorize() if factorize else None)
+        if is_matrix(lhs):
+            # nor is a matrix under a scalar
+            raise InvalidArgumentsForOperator
+        if is_value(lhs) and is_value(rhs):
+            return rhs / lhs
         raise InvalidArgumentsForOperator
 
     @staticmethod
@@ -73,30 +94,125 @@ class Operators(object):
 
     @staticmethod
     def elem_multiply(lhs, rhs):
-        if isinstance(lhs, list) and isinstance(rhs, list):
-            return (numpy.array(lhs) * numpy.array(rhs)).tolist()
-        return Operators.multiply(lhs, rhs)
+        if is_value(lhs) and is_value(rhs):
+            return lhs * rhs
+        raise InvalidArgumentsForOperator
 
     @staticmethod
     def elem_divide(lhs, rhs):
-        return Operators.multiply(lhs, rhs)
+        if is_value(lhs) and is_value(rhs):
+            return lhs / rhs
+        raise InvalidArgumentsForOperator
 
     @staticmethod
     def transpose(array):
-        return numpy.array(array).T.tolist()
+        if is_array(array):
+            return array.T
+        if is_scalar(array):
+            return array
+        raise InvalidArgumentsForOperator
 
     @staticmethod
     def invert(matrix_array):
         if len(matrix_array) != 1:
             raise MatlabetteRuntimeError('inv takes only one argument')
-        if not isinstance(matrix_array[0], list):
+        if not is_array(matrix_array[0]):
             raise MatlabetteRuntimeError('Invalid argument for inv')
-        return numpy.linalg.inv(matrix_array[0]).tolist()
+        return numpy.linalg.inv(matrix_array[0])
 
     @staticmethod
     def transpose_function(matrix_array):
         if len(matrix_array) != 1:
             raise MatlabetteRuntimeError('transpose takes only one argument')
-        if not isinstance(matrix_array[0], list):
+        if not is_array(matrix_array[0]):
             raise MatlabetteRuntimeError('Invalid argument for transpose')
         return Operators.transpose(matrix_array[0])
+
+    @staticmethod
+    def range(bounds):
+        """
+        start:stop or start:step:stop, as a row vector. A ':' on its own
+        in an index has no bounds and selects all of a dimension
+        """
+        if not bounds:
+            return slice(None)
+        if not all(is_scalar(bound) for bound in bounds):
+            raise MatlabetteRuntimeError('Range bounds must be scalars')
+        start, stop = bounds[0], bounds[-1]
+        step = bounds[1] if len(bounds) == 3 else 1.0
+        if step == 0 or (stop - start) / step < 0:
+            return numpy.empty((1, 0))
+        # allow for rounding in (stop - start) / step, as MATLAB does
+        count = int(numpy.floor((stop - start) / step + 1e-10)) + 1
+        return (start + step * numpy.arange(count, dtype=float)) \
+            .reshape(1, count)
+
+    @staticmethod
+    def dimensions(name, params):
+        """
+        Return the rows and columns asked for by the arguments of the array
+        constructor name: none for 1x1, n for nxn or m and n for mxn
+        """
+        if len(params) > 2:
+            raise MatlabetteRuntimeError(
+                '{} takes at most two arguments'.format(name)
+            )
+        for param in params:
+            if not is_scalar(param) or param < 0 or param != int(param):
+                raise MatlabetteRuntimeError(
+                    'Invalid argument for {}'.format(name)
+                )
+        if not params:
+            return 1, 1
+        if len(params) == 1:
+            return int(params[0]), int(params[0])
+        return int(params[0]), int(params[1])
+
+    @staticmethod
+    def zeros(params):
+        return numpy.zeros(Operators.dimensions('zeros', params))
+
+    @staticmethod
+    def ones(params):
+        return numpy.ones(Operators.dimensions('ones', params))
+
+    @staticmethod
+    def eye(params):
+        return numpy.eye(*Operators.dimensions('eye', params))
+
+    @staticmethod
+    def rand(random, params):
+        return random.random_sample(Operators.dimensions('rand', params))
+
+    @staticmethod
+    def randn(random, params):
+        return random.standard_normal(Operators.dimensions('randn', params))
+
+    @staticmethod
+    def seed(random, params):
+        """
+        rng(seed) makes rand and randn repeatable
+        """
+        if len(params) != 1 or not is_scalar(params[0]) \
+                or params[0] < 0 or params[0] != int(params[0]):
+            raise MatlabetteRuntimeError(
+                'rng takes a non-negative integer seed'
+            )
+        random.seed(int(params[0]))
+        return params[0]
+
+    @staticmethod
+    def linspace(params):
+        """
+        linspace(start, stop) or linspace(start, stop, count), as a row
+        vector. count defaults to 100
+        """
+        if len(params) not in (2, 3) \
+                or not all(is_scalar(param) for param in params):
+            raise MatlabetteRuntimeError(
+                'linspace takes two or three scalar arguments'
+            )
+        count = int(params[2]) if len(params) == 3 else 100
+        return numpy.linspace(
+            params[0], params[1], max(count, 0)
+        ).reshape(1, max(count, 0))
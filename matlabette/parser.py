@@ -4,9 +4,14 @@ Uses recursive-descent parsing algorithm
 
 Grammar
 =======
-statement     : identifier '=' expr
-              | identifier
-expr          : array_expr
+statement     : identifier '=' expr [';']
+              | identifier '(' arguments ')' '=' expr [';']
+              | identifier [';']
+              | expr [';']
+expr          : operand
+              | operand ':' operand
+              | operand ':' operand ':' operand
+operand       : array_expr
               | atom
 array_expr    : '[' array_list ']'
 
@@ -17,9 +22,17 @@ expr_list     : expr ',' expr_list
               | expr expr_list
               | expr
 
+arguments     : argument ',' arguments
+              | argument arguments
+              | argument
+argument      : ':'
+              | expr
+
 atom          : NUMERIC_LITERAL
               | '-' NUMERIC_LITERAL
 
+Any other operand after a '-' that isn't subtracting is negated
+
 identifier    : IDENTIFIER
 
 """
@@ -27,6 +40,8 @@ identifier    : IDENTIFIER
 from __future__ import unicode_literals
 from lexer import Token
 from errors import MatlabetteSyntaxError
+from folding import fold
+import numpy
 
 
 class Parser(object):
@@ -72,18 +87,26 @@ class Parser(object):
                 left_child=ParseTreeNode(value='ans', locked=True),
                 right_child=self.expression(True)
             )
+        # a trailing ';' suppresses the display of the result
+        if self.match(Token.SEMI_COLON):
+            self.consume()
+            parse_tree.silent = True
         self.expect(Token.END_OF_LINE)
-        return parse_tree
+        return fold(parse_tree)
 
     def statement(self):
         """
         Implements the rule:
             statement     : identifier '=' expr
+                          | identifier '(' arguments ')' '=' expr
                           | identifier
+        Anything else starting with an identifier is an expression, so the
+        parser backs up to parse it as one
         """
+        start = self.position
         identifier = self.identifier()
         if identifier is not None:
-            if self.match(Token.END_OF_LINE):
+            if self.match(Token.END_OF_LINE) or self.match(Token.SEMI_COLON):
                 node = ParseTreeNode(
                     operator=u'show',
                     value=identifier,
@@ -98,62 +121,39 @@ class Parser(object):
                     right_child=self.expression(True)
                 )
                 return node
-            elif self.match(Token.TRANSPOSE_OPERATOR):
-                self.consume()
-                node = ParseTreeNode(
-                    left_child=ParseTreeNode(value=u'ans', locked=True),
-                    operator=u'=',
-                    right_child=ParseTreeNode(value=identifier, operator=u'\'')
-                )
-                return node
             elif self.match(Token.LEFT_PARENTHESIS):
                 self.consume()
-                function = ParseTreeNode(
-                    value=identifier,
-                    locked=True
-                )
-                node = ParseTreeNode(
-                    operator=u'call',
-                    left_child=function,
-                    right_child=ParseTreeNode(value=self.expression_list())
-                )
-                self.expect(Token.RIGHT_PARENTHESIS)
-                return ParseTreeNode(
-                    left_child=ParseTreeNode(value=u'ans', locked=True),
-                    operator=u'=',
-                    right_child=node
-                )
-
-            else:
-                op, sub_expr = self.sub_expression()
-                if sub_expr is not None:
-                    return ParseTreeNode(
-                        left_child=ParseTreeNode(value=u'ans', locked=True),
-                        operator=u'=',
-                        right_child=ParseTreeNode(
-                            operator=op,
-                            left_child=ParseTreeNode(value=identifier),
-                            right_child=sub_expr)
-                    )
-                op, sub_expr = self.sub_term()
-                if sub_expr is not None:
-                    return ParseTreeNode(
-                        left_child=ParseTreeNode(value=u'ans', locked=True),
+                call = self.call(identifier)
+                if self.match(Token.ASSIGN_OPERATOR):
+                    self.consume()
+                    # assigning to part of a variable
+                    node = ParseTreeNode(
+                        left_child=call,
                         operator=u'=',
-                        right_child=ParseTreeNode(
-                            operator=op,
-                            left_child=ParseTreeNode(value=identifier),
-                            right_child=sub_expr)
+                        right_child=self.expression(True)
                     )
-                raise MatlabetteSyntaxError(
-                    self.token_value,
-                    "'=', (, ' or an operator"
-                )
+                    return node
+        self.position = start
         return None
 
     def expression(self, fail):
         """
-        Implements: expression : array_expr | atom
+        Implements: expression : operand [':' operand [':' operand]]
+        :param fail: if set to True, raise an exception instead of returning None
+        """
+        operand = self.operand(fail)
+        if operand is None or not self.match(Token.COLON):
+            return operand
+        # start:stop or start:step:stop
+        bounds = [operand]
+        while self.match(Token.COLON) and len(bounds) < 3:
+            self.consume()
+            bounds.append(self.operand(True))
+        return ParseTreeNode(operator=u':', value=bounds)
+
+    def operand(self, fail):
+        """
+        Implements: operand : array_expr | atom
         :param fail: if set to True, raise an exception instead of returning None
         """
         term = self.term()
@@ -213,6 +213,7 @@ class Parser(object):
     def sub_term(self):
         node = ParseTreeNode()
         if self.match(Token.DIVIDE_OPERATOR) \
+                or self.match(Token.LEFT_DIVIDE_OPERATOR) \
                 or self.match(Token.MULTIPLY_OPERATOR) \
                 or self.match(Token.ELEM_DIVIDE_OPERATOR) \
                 or self.match(Token.ELEM_MULTIPLY_OPERATOR):
@@ -234,6 +235,9 @@ class Parser(object):
             array_expression : '[' array_list ']'
         """
         if self.match(Token.LEFT_SQUARE_BRACKET):
+            node = self.numeric_array()
+            if node is not None:
+                return node
             self.consume()
             node = self.array_list()
             self.expect(Token.RIGHT_SQUARE_BRACKET)
@@ -241,6 +245,47 @@ class Parser(object):
             return None
         return node
 
+    def numeric_array(self):
+        """
+        Read an array literal holding only numbers, such as the ones in a
+        saved workspace, straight into a read-only array instead of a node
+        per cell. Returns None without consuming anything if the literal
+        holds anything else, or if a '-' in it is not a sign
+        """
+        rows = []
+        row = []
+        sign = None
+        position = self.position + 1
+        for token_type, value in self.tokens[position:]:
+            position += 1
+            if token_type in (Token.INTEGER_LITERAL, Token.FLOAT_LITERAL):
+                number = float(value)
+                row.append(-number if sign else number)
+                sign = False
+            elif token_type == Token.SUBTRACT_OPERATOR and sign is None:
+                sign = True
+            elif sign is False and token_type == Token.COMMA:
+                sign = None
+            elif sign is False and token_type == Token.SEMI_COLON:
+                rows.append(row)
+                row = []
+                sign = None
+            elif token_type == Token.RIGHT_SQUARE_BRACKET and not sign \
+                    and (row or rows):
+                break
+            else:
+                return None
+        else:
+            return None
+        if row:
+            rows.append(row)
+        if any(len(row) != len(rows[0]) for row in rows):
+            return None
+        array = numpy.array(rows, dtype=float)
+        array.setflags(write=False)
+        self.position = position
+        return ParseTreeNode(value=array, locked=True)
+
     def array_list(self):
         """
         Implements the rule:
@@ -276,23 +321,61 @@ class Parser(object):
                 break
         return expressions
 
+    def arguments(self):
+        """
+        Implements the rule:
+            arguments     : argument ',' arguments
+                          | argument arguments
+                          | argument
+            argument      : ':'
+                          | expr
+        A ':' on its own indexes all of a dimension
+        """
+        arguments = []
+        while True:
+            if self.match(Token.COMMA):
+                self.consume()
+            if self.match(Token.COLON) and self.tokens[self.position + 1][0] \
+                    in (Token.COMMA, Token.RIGHT_PARENTHESIS):
+                self.consume()
+                arguments.append(
+                    ParseTreeNode(operator=u':', value=[], locked=True)
+                )
+                continue
+            expression = self.expression(False)
+            if expression is not None:
+                arguments.append(expression)
+            else:
+                break
+        return arguments
+
+    def call(self, identifier):
+        """
+        Parse the arguments after identifier '('. Whether this indexes a
+        variable or calls a function is only known when it runs, since
+        variables come and go, and a variable is looked for first
+        """
+        node = ParseTreeNode(
+            operator=u'call',
+            left_child=ParseTreeNode(value=identifier, locked=True),
+            right_child=ParseTreeNode(value=self.arguments())
+        )
+        self.expect(Token.RIGHT_PARENTHESIS)
+        return node
+
     def terminal(self):
+        if self.match(Token.KEYWORD) and self.token_value == u'end':
+            # the size of the dimension being indexed
+            self.consume()
+            return ParseTreeNode(operator=u'end', value=u'end', locked=True)
         terminal = self.atom()
+        if terminal is None and self.match(Token.SUBTRACT_OPERATOR):
+            return self.negation()
         if terminal is None:
             terminal = self.identifier()
             if terminal is not None and self.match(Token.LEFT_PARENTHESIS):
                 self.consume()
-                function = ParseTreeNode(
-                    value=terminal,
-                    locked=True
-                )
-                node = ParseTreeNode(
-                    operator=u'call',
-                    left_child=function,
-                    right_child=ParseTreeNode(value=self.expression_list())
-                )
-                self.expect(Token.RIGHT_PARENTHESIS)
-                return node
+                return self.call(terminal)
 
         if terminal is not None:
             node = ParseTreeNode(value=terminal)
@@ -303,6 +386,21 @@ class Parser(object):
             self.consume()
         return node
 
+    def negation(self):
+        """
+        Parse '-' followed by an operand that isn't a number, such as -a
+        or -[1 2], as the operand subtracted from 0
+        """
+        self.consume()
+        operand = self.terminal()
+        if operand is None:
+            raise MatlabetteSyntaxError(self.token_value, "[ or a number")
+        return ParseTreeNode(
+            operator=u'-',
+            left_child=ParseTreeNode(value=0.0),
+            right_child=operand
+        )
+
     def identifier(self):
         """
         Implements the rule:
@@ -326,7 +424,9 @@ class Parser(object):
                 or self.match(Token.FLOAT_LITERAL):
             value = float(self.token_value)
             self.consume()
-        elif self.match(Token.SUBTRACT_OPERATOR):
+        elif self.match(Token.SUBTRACT_OPERATOR) \
+                and self.tokens[self.position + 1][0] \
+                in (Token.INTEGER_LITERAL, Token.FLOAT_LITERAL):
             self.consume()
             value = -self.atom()
         return value
@@ -344,3 +444,4 @@ class ParseTreeNode(object):
         self.right_child = kwargs.get("right_child")
         self.value = kwargs.get("value")
         self.locked = kwargs.get("locked", False)
+        self.silent = kwargs.get("silent", False)
@@ -0,0 +1,187 @@
+"""
+Times operators, functions and the phases of running a statement
+
+While profiling is on, every entry in the operator and function tables of
+the context is replaced with a wrapper recording how long each call takes
+and the shapes of its arguments. Turning profiling off puts the original
+entries back, so it costs nothing when it isn't used. Statements compiled
+while profiling was off or on hold the entries of the time, so they have
+to be compiled again when it is switched.
+
+Times include the calls made inside, and operators worked out when a line
+is parsed, or run in one pass by a FusedExpression, are not timed on their
+own.
+"""
+from __future__ import unicode_literals
+from collections import Counter
+from contextlib import contextmanager
+from operators import is_array, is_scalar
+from timeit import default_timer
+import json
+import marshal
+import os
+
+
+def signature(args):
+    """
+    Describe the shapes of the values in args, such as 2x3, scalar
+    """
+    shapes = []
+    for arg in args:
+        if is_array(arg):
+            shapes.append("x".join(str(size) for size in arg.shape))
+        elif is_scalar(arg):
+            shapes.append("scalar")
+        elif isinstance(arg, list):
+            shapes.append("({})".format(signature(arg)))
+    return ", ".join(shapes)
+
+
+class Entry(object):
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.calls = 0
+        self.time = 0.0
+        self.shapes = Counter()
+
+    @property
+    def label(self):
+        return "{} {}".format(self.kind, self.name)
+
+
+class Profiler(object):
+
+    def __init__(self):
+        self.enabled = False
+        self.entries = {}
+        self.originals = None
+
+    def start(self, context):
+        """
+        Time the operators and functions of context
+        """
+        if self.enabled:
+            return
+        tables = self.tables(context)
+        self.originals = [dict(table) for table, _ in tables]
+        for table, kind in tables:
+            for name, function in list(table.items()):
+                table[name] = self.timed(kind, name, function)
+        self.enabled = True
+
+    def stop(self, context):
+        if not self.enabled:
+            return
+        for (table, _), original in zip(self.tables(context),
+                                        self.originals):
+            table.clear()
+            table.update(original)
+        self.originals = None
+        self.enabled = False
+
+    @staticmethod
+    def tables(context):
+        return [
+            (context.binary_operations, 'operator'),
+            (context.unary_operations, 'operator'),
+            (context.functions, 'function'),
+        ]
+
+    def clear(self):
+        self.entries = {}
+
+    def record(self, kind, name, time, shapes=""):
+        entry = self.entries.get((kind, name))
+        if entry is None:
+            entry = self.entries[(kind, name)] = Entry(kind, name)
+        entry.calls += 1
+        entry.time += time
+        if shapes:
+            entry.shapes[shapes] += 1
+
+    def timed(self, kind, name, function):
+        """
+        Return function, recording the time of every call
+        """
+        record = self.record
+
+        def timed_function(*args):
+            start = default_timer()
+            try:
+                return function(*args)
+            finally:
+                record(kind, name, default_timer() - start, signature(args))
+        # lets the compiler recognise the operations it special-cases
+        timed_function.wrapped = function
+        return timed_function
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time the code run in the with block as a phase of a statement
+        """
+        start = default_timer()
+        try:
+            yield
+        finally:
+            self.record('phase', name, default_timer() - start)
+
+    def hot_spots(self):
+        return sorted(
+            self.entries.values(), key=lambda entry: entry.time, reverse=True
+        )
+
+    def report(self, limit=20):
+        """
+        Generate a table of the entries taking the most time
+        """
+        if not self.entries:
+            return "{0} No profile recorded{0}".format(os.linesep)
+        lines = [
+            "",
+            " {:>10}  {:>8}  {:>13}  {:<20}  {}".format(
+                "time (s)", "calls", "per call (ms)", "name", "shapes"
+            ),
+        ]
+        for entry in self.hot_spots()[:limit]:
+            shapes = ", ".join(
+                "{} ({})".format(shape, count)
+                for shape, count in entry.shapes.most_common(2)
+            )
+            lines.append(" {:>10.4f}  {:>8}  {:>13.4f}  {:<20}  {}".format(
+                entry.time, entry.calls, entry.time * 1000 / entry.calls,
+                entry.label, shapes
+            ))
+        return os.linesep.join(lines) + os.linesep
+
+    def export(self, filename):
+        """
+        Write the entries to filename, as JSON if it ends in .json and
+        otherwise in the format pstats.Stats reads
+        """
+        if filename.endswith('.json'):
+            with open(filename, 'w') as f:
+                json.dump({'entries': [
+                    {
+                        'kind': entry.kind,
+                        'name': entry.name,
+                        'calls': entry.calls,
+                        'time': entry.time,
+                        'shapes': dict(entry.shapes),
+                    }
+                    for entry in self.hot_spots()
+                ]}, f, indent=2)
+            return
+        # (file, line, function): (primitive calls, calls, own time,
+        # cumulative time, callers)
+        stats = dict(
+            (
+                (str('matlabette'), 0, str(entry.label)),
+                (entry.calls, entry.calls, entry.time, entry.time, {})
+            )
+            for entry in self.entries.values()
+        )
+        with open(filename, 'wb') as f:
+            marshal.dump(stats, f)
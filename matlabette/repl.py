@@ -2,55 +2,76 @@
 Manages the read-eval-print loop
 """
 from __future__ import unicode_literals, print_function
-from prompt_toolkit import prompt
-from prompt_toolkit.history import FileHistory
-from pygments.lexers.matlab import MatlabLexer
 from colorama import Fore, init
-from prompt_toolkit.contrib.completers import WordCompleter
+from collections import deque
 
-from lexer import Lexer
-from parser import Parser
 from errors import MatlabetteError
 from context import Context
+from cache import StatementCache
+from completion import CompletionIndex, prompt_completer
+from display import Display
+from jobs import JobQueue, FAILED, CANCELLED
+from journal import Journal
+from lexer import Lexer
+from parser import Parser
+from profiler import Profiler
+import history
+import workspace
 import os
-import re
+import sys
 
-init()
-home = os.environ.get("HOME") or os.environ.get("USERPROFILE")
-workspace, history = None, None
-if home:
+
+def default_files():
+    """
+    Return the paths of the default workspace and history files, creating
+    ~/.matlabette if it doesn't exist
+    """
+    home = os.environ.get("HOME") or os.environ.get("USERPROFILE")
+    if not home:
+        return 'workspace', 'history'
     matlabette_dir = os.path.join(home, '.matlabette')
     if not os.path.isdir(matlabette_dir):
         os.mkdir(matlabette_dir)
-    if matlabette_dir:
-        workspace = os.path.join(matlabette_dir, 'workspace')
-        if not os.path.isfile(workspace):
-            open(workspace, 'w').close()
-        history = os.path.join(matlabette_dir, 'history')
-workspace_file = workspace or 'workspace'
-history_file = history or 'history'
+    workspace = os.path.join(matlabette_dir, 'workspace')
+    if not os.path.isfile(workspace):
+        open(workspace, 'w').close()
+    return workspace, os.path.join(matlabette_dir, 'history')
 
 
 class Repl(object):
-    def __init__(self):
-        self.history = FileHistory(history_file)
+    def __init__(self, use_compiler=True):
+        init()
+        self.workspace_file, self.history_file = default_files()
+        self.history = None
+        self.journal = Journal(self.workspace_file)
         self.context = Context({
             u'help': self.help,
             u'exit': self.exit,
             u'save': self.save,
             u'load': self.load_default,
-        })
-
-    @staticmethod
-    def get_word_completer():
-        if os.path.isfile(history_file):
-            _file = open(history_file)
-            history_list = _file.read().split('\n')
-            history_list = [
-                re.sub(r'#.*', '',  re.sub('^\+', '', i))
-                for i in history_list
-                ]
-            return WordCompleter(list(set(history_list)), ignore_case=True)
+            u'cache': self.cache_report,
+            u'profile': self.profile,
+        }, use_compiler=use_compiler)
+        self.statements = StatementCache()
+        self.profiler = Profiler()
+        self.jobs = JobQueue(self.context)
+        self.job_commands = {
+            u'jobs': self.list_jobs,
+            u'wait': self.wait,
+            u'cancel': self.cancel,
+            u'bg': self.background,
+        }
+        self.completer = None
+        self.completions = CompletionIndex(
+            list(self.context.functions) + list(self.context.commands) +
+            list(self.job_commands)
+        )
+        for entry in history.load(self.history_file):
+            self.completions.add_line(entry)
+        # variables are assigned on the worker thread while the prompt
+        # reads the completions, so new names are added before each prompt
+        self.new_names = deque()
+        self.context.change_hooks.append(self.new_names.append)
 
     def loop(self, message="matlabette> "):
         try:
@@ -60,19 +81,53 @@ class Repl(object):
  Type help for help.""")
             print ()
             while True:
+                self.report_finished()
+                self.add_new_names()
                 line = self.prompt(message)
+                self.completions.add_line(line)
                 self.eval(line)
 
         except (KeyboardInterrupt, EOFError):
-            if self.context.variables:
+            if not self.stop_jobs():
+                return
+            if self.context.variables or self.context.pending:
                 self.exit_prompt()
 
+    def add_new_names(self):
+        while self.new_names:
+            self.completions.add(self.new_names.popleft())
+
+    def stop_jobs(self):
+        """
+        Cancel the jobs and wait for the running one to stop, so the
+        workspace isn't saved while a job is changing it
+        :return: whether the jobs stopped
+        """
+        self.jobs.cancel_all()
+        try:
+            self.jobs.wait()
+            return True
+        except KeyboardInterrupt:
+            print(Fore.YELLOW)
+            print(" Workspace not saved")
+            print()
+            return False
+
     def prompt(self, message):
+        # prompt_toolkit and pygments are slow to import and only needed
+        # once there is someone to prompt
+        from prompt_toolkit import prompt
+        from prompt_toolkit.history import FileHistory
+        from pygments.lexers.matlab import MatlabLexer
+
+        if self.history is None:
+            self.history = FileHistory(self.history_file)
+            self.completer = prompt_completer(self.completions)
         return prompt(
             message,
             history=self.history,
             lexer=MatlabLexer,
-            completer=self.get_word_completer(),
+            completer=self.completer,
             display_completions_in_columns=True,
             mouse_support=True
         )
@@ -92,9 +147,24 @@ class Repl(object):
             print ()
 
     def eval(self, line):
+        words = line.split(None, 1)
+        if words and words[0] in self.job_commands and (
+                len(words) == 1 or words[1][0] not in '=(') \
+                and not (words[0] == u'bg' and len(words) == 1):
+            self.job_commands[words[0]](words[1] if len(words) > 1 else '')
+            return
+        if line.rstrip().endswith('&'):
+            self.background(line.rstrip()[:-1])
+            return
+
+        # commands use the whole workspace, so they wait for the jobs
+        # before them and run here rather than on the worker thread
+        command = line.strip().rstrip(';').strip()
+        if self.is_command(line):
+            if not self.wait_for(None):
+                return
         if line.startswith("save "):
-            filename = line.replace("save ", "")
-            self.save(filename)
+            self.save(line.replace("save ", ""))
             return
 
         if line.startswith("load "):
@@ -102,55 +172,245 @@ class Repl(object):
             self.load(filename)
             return
 
-        tokens = Lexer.lex(line)
-        try:
-            parse_tree = Parser(tokens).parse()
-            if parse_tree:
-                output = self.context.evaluate(parse_tree)
-                if output:
-                    print(Fore.GREEN + output)
+        if line.startswith("profile "):
+            output = self.profile(line.replace("profile ", ""))
+            if output:
+                print(Fore.BLUE + output)
+            return
 
+        try:
+            statement = self.prepare(line)
+            if command in self.context.commands:
+                self.show(statement())
+                return
         except MatlabetteError as e:
-            print(Fore.RED)
-            print(" Error: " + e.message)
+            self.show_error(e.message)
+            return
+        job = self.jobs.submit(line, statement)
+        if self.wait_for(job):
+            self.show_job(job)
+
+    def is_command(self, line):
+        command = line.strip().rstrip(';').strip()
+        return line.startswith("save ") or line.startswith("load ") \
+            or line.startswith("profile ") \
+            or command in self.context.commands
+
+    def prepare(self, line):
+        """
+        Return the prepared statement for line. While profiling, lexing,
+        parsing, compiling and evaluating are timed separately
+        """
+        if not self.profiler.enabled:
+            return self.statements.statement(line, self.context)
+        profiler = self.profiler
+        statement = self.statements.get(line)
+        if statement is None:
+            with profiler.phase('lex'):
+                tokens = Lexer.lex(line)
+            with profiler.phase('parse'):
+                parse_tree = Parser(tokens).parse()
+            with profiler.phase('compile'):
+                statement = self.context.prepare(parse_tree)
+            self.statements.put(line, statement)
+        return profiler.timed('phase', 'evaluate', statement)
+
+    def profile(self, arguments=''):
+        """
+        profile on|off|clear|report [file]. Switching profiling empties the
+        statement cache, since statements hold the operators they were
+        compiled with
+        """
+        words = arguments.split(None, 1)
+        action = words[0] if words else 'report'
+        if action == 'on':
+            self.profiler.start(self.context)
+            self.statements.clear()
+        elif action == 'off':
+            self.profiler.stop(self.context)
+            self.statements.clear()
+        elif action == 'clear':
+            self.profiler.clear()
+        elif action == 'report' and len(words) > 1:
+            try:
+                self.profiler.export(words[1].strip())
+            except (IOError, OSError):
+                return " Error: failed to open '{}'".format(
+                    os.path.abspath(words[1].strip()))
+            return " Profile written to '{}'".format(
+                os.path.abspath(words[1].strip()))
+        elif action == 'report':
+            return self.profiler.report()
+        else:
+            return " Usage: profile on|off|clear|report [file]"
+
+    def wait_for(self, job):
+        """
+        Wait for job, or all the jobs if None. Ctrl+C cancels the running
+        job instead of ending the session
+        :return: whether job finished, or for None whether the wait wasn't
+        cancelled
+        """
+        try:
+            self.jobs.wait(job)
+            return True
+        except KeyboardInterrupt:
+            running = self.jobs.running
+            self.jobs.cancel_running()
+        if running is not None:
+            # it stops before its next operation, or finishes first
+            self.jobs.wait(running)
+        if job is not None and job.finished.is_set():
+            return True
+        print(Fore.YELLOW)
+        print(" Cancelled")
+        print()
+        return False
+
+    def show(self, output):
+        if isinstance(output, Display):
+            sys.stdout.write(Fore.GREEN)
+            for text in output:
+                sys.stdout.write(text)
+            print()
+        elif output:
+            print(Fore.GREEN + output)
+
+    @staticmethod
+    def show_error(message):
+        print(Fore.RED)
+        print(" Error: " + message)
+        print()
+
+    def show_job(self, job):
+        if job.state == FAILED:
+            self.show_error(job.error)
+        elif job.state == CANCELLED:
+            print(Fore.YELLOW)
+            print(" Cancelled")
             print()
+        else:
+            self.show(job.output)
+
+    def background(self, line):
+        """
+        Queue line to run while the prompt carries on. Commands are
+        refused, as they only run on the main thread
+        """
+        if self.is_command(line.strip()):
+            self.show_error("Commands can't run in the background")
+            return
+        try:
+            statement = self.prepare(line)
+        except MatlabetteError as e:
+            self.show_error(e.message)
+            return
+        job = self.jobs.submit(line.strip(), statement, background=True)
+        print(Fore.BLUE + " [{}] {}".format(job.number, job.line))
+
+    def selected_jobs(self, argument):
+        """
+        Return the background job numbered argument, or all of them if
+        there is no argument
+        """
+        argument = argument.strip()
+        if not argument:
+            return list(self.jobs.jobs)
+        job = self.jobs.find(int(argument)) if argument.isdigit() else None
+        if job is None:
+            self.show_error("No job {}".format(argument))
+            return []
+        return [job]
+
+    def list_jobs(self, argument=''):
+        for job in self.jobs.jobs:
+            print(Fore.BLUE + " [{}] {:<10}{}".format(
+                job.number, job.state, job.line))
+        for job in self.jobs.jobs:
+            job.reported = job.finished.is_set()
+
+    def wait(self, argument=''):
+        """
+        Wait for background jobs and show what they output
+        """
+        for job in self.selected_jobs(argument):
+            if not self.wait_for(job):
+                return
+            print(Fore.BLUE + " [{}] {}".format(job.number, job.line))
+            self.show_job(job)
+            self.jobs.jobs.remove(job)
+
+    def cancel(self, argument=''):
+        for job in self.selected_jobs(argument):
+            if self.jobs.cancel(job):
+                print(Fore.YELLOW + " [{}] cancelled".format(job.number))
+
+    def report_finished(self):
+        """
+        Say which background jobs have finished since the last prompt
+        """
+        for job in self.jobs.jobs:
+            if job.finished.is_set() and not job.reported:
+                job.reported = True
+                print(Fore.BLUE + " [{}] {:<10}{}".format(
+                    job.number, job.state, job.line))
+
+    def cache_report(self):
+        return self.statements.report() + \
+            self.context.factorizations.report()
 
     def load(self, filename):
         print ()
         try:
-            with open(filename, 'r') as f:
-                print(Fore.BLUE + " Loading workspace from '{}'"
-                      .format(os.path.abspath(filename)))
-                input_line = f.readline()
-                while input_line:
-                    self.eval(input_line)
-                    input_line = f.readline()
-                print(Fore.BLUE + " Done")
+            print(Fore.BLUE + " Loading workspace from '{}'"
+                  .format(os.path.abspath(filename)))
+            if self.is_default(filename):
+                self.journal.load(self.context, self.eval)
+            else:
+                workspace.load(filename, self.context, self.eval)
+            print(Fore.BLUE + " Done")
         except IOError:
             print(Fore.RED + " Error: failed to open '{}'"
                   .format(os.path.abspath(filename)))
+        except MatlabetteError as e:
+            print(Fore.RED + " Error: " + e.message)
         print ()
 
     def load_default(self):
-        if os.path.isfile(workspace_file):
-            self.load(workspace_file)
+        if os.path.isfile(self.workspace_file):
+            self.load(self.workspace_file)
         else:
             print (Fore.YELLOW)
             print(" Default workspace doesn't exist. To create it, type save")
             print ()
 
-    def save(self, filename=workspace_file):
+    def save(self, arguments=''):
+        """
+        Save the workspace, in the binary format if arguments has -binary
+        or a filename ending in .mlw. Saving to the default workspace only
+        appends the changed variables to its journal
+        """
+        filename, binary = workspace.parse_arguments(arguments)
+        filename = filename or self.workspace_file
         print()
         try:
-            with open(filename, 'w') as f:
-                f.write(self.context.serialize())
-                print(Fore.BLUE + " Workspace saved to '{}'"
-                      .format(os.path.abspath(filename)))
-        except IOError:
+            if not self.is_default(filename):
+                workspace.save(filename, self.context, binary)
+            elif binary is None:
+                self.journal.save(self.context)
+            else:
+                self.journal.compact(self.context, binary)
+            print(Fore.BLUE + " Workspace saved to '{}'"
+                  .format(os.path.abspath(filename)))
+        except (IOError, OSError):
             print(Fore.RED + " Error: failed to open '{}'"
                   .format(os.path.abspath(filename)))
         print()
 
+    def is_default(self, filename):
+        return os.path.abspath(filename) == \
+            os.path.abspath(self.workspace_file)
+
     @staticmethod
     def exit():
         raise KeyboardInterrupt
@@ -169,6 +429,32 @@ Array creation
     a = [1, 2]
     b = [10 30; 40 50]
 
+Ranges and constructors
+-----------------------
+    1:5
+    0:0.25:1
+    zeros(2, 3)
+    ones(2)
+    eye(3)
+    linspace(0, 1, 5)
+    rng(42)
+    rand(2, 2)
+    randn(3)
+
+End a statement with ; to run it without displaying the result. Arrays
+of more than 1000 elements are shown truncated.
+
+Indexing
+--------
+    a = [1 2 3; 4 5 6; 7 8 9]
+    a(2, 3)
+    a(2:end, :)
+    a(5)
+    a(1, :) = 0
+
+Parts of an array are read without copying it, and assigning to them
+changes the array in place.
+
 Array and matrix operations
 ===========================
 Transpose
@@ -194,10 +480,54 @@ Inverse
 -------
     inv([2 0; 0 2])
 
+Solving linear systems
+----------------------
+    a = [4 1; 1 3]
+    b = [1; 2]
+    a \\ b
+    b' / a
+
 Save and load workspace
 =======================
     save <filename>
+    save -binary <filename>
     load <filename>
+
+Binary workspaces (also used for names ending in .mlw) save and load
+large arrays much faster.
+
+Background jobs
+===============
+    c = inv(a) &
+    bg c = inv(a)
+    jobs
+    wait [job]
+    cancel [job]
+
+Statements run one at a time on a worker thread. Ending one with & or
+starting it with bg queues it and returns to the prompt; wait shows what
+a job output. Ctrl+C cancels the running statement. A single long
+operation, such as inverting a large matrix, finishes before it stops.
+
+Statement and factorization cache statistics
+============================================
+    cache
+
+Timing and profiling
+====================
+    tic
+    toc
+    t = tic()
+    toc(t)
+    profile on
+    profile off
+    profile clear
+    profile report [file]
+
+While profiling is on, every operator and function call is timed, along
+with lexing, parsing, compiling and evaluating each statement. The report
+lists where the time went; profile report saves it instead, as JSON if
+the file name ends in .json and in the pstats format otherwise.
 """
 
 
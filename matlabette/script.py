@@ -0,0 +1,137 @@
+"""
+Runs statements from a script, stdin or the command line without the
+interactive prompt
+"""
+from __future__ import unicode_literals
+from errors import MatlabetteError, MatlabetteRuntimeError
+from context import Context
+from cache import StatementCache
+from display import Display
+import workspace
+import os
+import sys
+
+
+class StopScript(BaseException):
+    """
+    Raised by the exit command to stop the script
+    """
+    pass
+
+
+class ScriptRunner(object):
+    """
+    Streams statements through the lexer, parser and context. Output is
+    buffered and written in large chunks
+    """
+    buffer_size = 1 << 16
+
+    def __init__(self, out=None, err=None, use_compiler=True):
+        self.out = out or sys.stdout
+        self.err = err or sys.stderr
+        self.context = Context({
+            u'exit': self.exit,
+        }, use_compiler=use_compiler)
+        self.statements = StatementCache()
+        self.buffer = []
+        self.buffered = 0
+        self.quiet = False
+
+    def run(self, lines, name='<string>'):
+        """
+        Run every line, stopping at the first error
+        :return: the exit status, 1 if a statement failed
+        """
+        number = 0
+        try:
+            for number, line in enumerate(lines, 1):
+                self.eval(line)
+        except MatlabetteError as e:
+            self.flush()
+            self.err.write("{}:{}: Error: {}{}".format(
+                name, number, e.message, os.linesep
+            ))
+            return 1
+        except StopScript:
+            pass
+        finally:
+            self.flush()
+        return 0
+
+    def eval(self, line):
+        if line.startswith("save "):
+            self.save(line.replace("save ", "").strip())
+            return
+
+        if line.startswith("load "):
+            self.load(line.replace("load ", "").strip())
+            return
+
+        output = self.statements.statement(line, self.context)()
+        if output and not self.quiet:
+            if isinstance(output, Display):
+                for text in output:
+                    self.write(text)
+            else:
+                self.write(output)
+            self.write(os.linesep)
+
+    def write(self, text):
+        self.buffer.append(text)
+        self.buffered += len(text)
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.out.write("".join(self.buffer))
+            self.buffer = []
+            self.buffered = 0
+        self.out.flush()
+
+    def load(self, filename):
+        try:
+            self.quiet = True
+            workspace.load(filename, self.context, self.eval)
+        except IOError:
+            raise MatlabetteRuntimeError(
+                "failed to open '{}'".format(os.path.abspath(filename))
+            )
+        finally:
+            self.quiet = False
+
+    def save(self, arguments):
+        filename, binary = workspace.parse_arguments(arguments)
+        try:
+            workspace.save(filename, self.context, binary)
+        except (IOError, OSError):
+            raise MatlabetteRuntimeError(
+                "failed to open '{}'".format(os.path.abspath(filename))
+            )
+
+    @staticmethod
+    def exit():
+        raise StopScript
+
+
+def run_file(filename, use_compiler=True):
+    """
+    Run the script in filename, or stdin if filename is '-'
+    """
+    runner = ScriptRunner(use_compiler=use_compiler)
+    if filename == '-':
+        return runner.run(sys.stdin, '<stdin>')
+    try:
+        with open(filename, 'r') as f:
+            return runner.run(f, filename)
+    except IOError as e:
+        sys.stderr.write("Error: {}{}".format(e, os.linesep))
+        return 2
+
+
+def run_string(statements, use_compiler=True):
+    """
+    Run statements separated by new lines
+    """
+    runner = ScriptRunner(use_compiler=use_compiler)
+    return runner.run(statements.splitlines(), '<string>')
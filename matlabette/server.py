@@ -0,0 +1,174 @@
+"""
+Serves sessions over a Unix domain socket or localhost TCP
+
+    matlabette serve (--socket PATH | --port PORT) [--processes N]
+
+Every connection is a session with its own Context, handled on its own
+thread. The client sends one JSON object per line, {"statement": "a = 1"}
+with an optional "id", and gets one back per line, with the same "id" and
+either the displayed "output" or an "error". exit ends the session.
+
+Matrix products, solves and inverses of large arrays are sent to a
+bounded pool of processes, so one session's heavy work doesn't hold the
+interpreter lock while the other sessions wait. The session's thread just
+waits for the result.
+"""
+from __future__ import unicode_literals
+from errors import MatlabetteError
+from context import Context
+from cache import StatementCache
+from display import Display
+from operators import Operators, is_array
+import SocketServer
+import json
+import multiprocessing
+import os
+
+
+class EndSession(BaseException):
+    """
+    Raised by the exit command to end the session
+    """
+    pass
+
+
+# run in the pool's processes, so they have to be found by name there
+def multiply(lhs, rhs):
+    return Operators.multiply(lhs, rhs)
+
+
+def divide(lhs, rhs):
+    return Operators.divide(lhs, rhs)
+
+
+def left_divide(lhs, rhs):
+    return Operators.left_divide(lhs, rhs)
+
+
+def invert(params):
+    return Operators.invert(params)
+
+
+def offload(pool, function, size):
+    """
+    Return function, running it in pool when an array among its arguments
+    has at least size elements and no argument is a scalar
+    """
+    def offloaded(*args):
+        values = args[0] if len(args) == 1 else args
+        if values and all(is_array(value) for value in values) \
+                and max(value.size for value in values) >= size:
+            return pool.apply_async(function, args).get()
+        return function(*args)
+    return offloaded
+
+
+class Session(object):
+    """
+    The context and prepared statements of one connection
+    """
+
+    def __init__(self, pool=None, offload_size=1 << 16):
+        self.context = Context({u'exit': self.exit})
+        self.statements = StatementCache()
+        if pool is not None:
+            operations = self.context.binary_operations
+            operations[u'*'] = offload(pool, multiply, offload_size)
+            operations[u'/'] = offload(pool, divide, offload_size)
+            operations[u'\\'] = offload(pool, left_divide, offload_size)
+            self.context.functions[u'inv'] = \
+                offload(pool, invert, offload_size)
+
+    def respond(self, line):
+        """
+        Return the response to a request line, or None once the session
+        has ended
+        """
+        try:
+            request = json.loads(line)
+            statement = request['statement']
+        except (ValueError, TypeError, KeyError):
+            return {'error': "Invalid request"}
+        if not isinstance(statement, unicode):
+            return {'error': "Invalid request"}
+        response = {}
+        if 'id' in request:
+            response['id'] = request['id']
+        try:
+            output = self.statements.statement(statement, self.context)()
+        except MatlabetteError as e:
+            response['error'] = e.message
+            return response
+        except EndSession:
+            return None
+        except Exception as e:
+            # a bug shouldn't end the session without an answer
+            response['error'] = "{}".format(e)
+            return response
+        if isinstance(output, Display):
+            output = "".join(output)
+        response['output'] = output or ""
+        return response
+
+    @staticmethod
+    def exit():
+        raise EndSession
+
+
+class SessionHandler(SocketServer.StreamRequestHandler):
+
+    def handle(self):
+        session = Session(self.server.pool, self.server.offload_size)
+        # not iterated over directly, which reads ahead on Python 2
+        for line in iter(self.rfile.readline, b''):
+            if not line.strip():
+                continue
+            response = session.respond(line.decode('utf-8'))
+            if response is None:
+                break
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+class TCPServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class UnixServer(SocketServer.ThreadingMixIn,
+                 SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+
+def create_server(socket_path=None, port=None, processes=None,
+                  offload_size=1 << 16):
+    """
+    Return a server on the Unix socket socket_path, or localhost port if
+    socket_path is None. processes is the size of the pool heavy matrix
+    work is sent to, the number of CPUs if None, and 0 for no pool
+    """
+    # started first so the processes don't inherit the listening socket
+    pool = multiprocessing.Pool(processes) if processes != 0 else None
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixServer(socket_path, SessionHandler)
+    else:
+        server = TCPServer(('127.0.0.1', port), SessionHandler)
+    server.pool = pool
+    server.offload_size = offload_size
+    return server
+
+
+def serve(socket_path=None, port=None, processes=None):
+    server = create_server(socket_path, port, processes)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if server.pool is not None:
+            server.pool.terminate()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
+    return 0
@@ -0,0 +1,233 @@
+"""
+Reads and writes saved workspaces
+
+A text workspace holds one assignment per line. A binary workspace
+starts with a header indexing every variable followed by the raw float64
+data of each one, aligned so that large arrays can be memory mapped on
+load instead of read.
+
+Loading only indexes the variables; each one is read from the file the
+first time it is used.
+
+Binary layout:
+
+    magic        8 bytes, b'MLTBWS01'
+    header size  8 bytes, little-endian unsigned
+    header       JSON: {"variables": [{"name", "shape", "offset"}, ...]}
+    data         little-endian float64, each variable starting on a
+                 64 byte boundary; offsets are relative to the data start
+"""
+from __future__ import unicode_literals
+from collections import OrderedDict
+from errors import MatlabetteRuntimeError
+from files import replace
+from operators import is_array
+from lexer import Lexer
+from parser import Parser
+from functools import partial
+import json
+import numpy
+import os
+import re
+import struct
+
+MAGIC = b'MLTBWS01'
+BINARY_EXTENSION = '.mlw'
+ALIGNMENT = 64
+# arrays of at least this many bytes are memory mapped when loaded
+MMAP_THRESHOLD = 1 << 20
+dtype = numpy.dtype('<f8')
+# a text line assigning only numbers, which can be evaluated at any time
+literal_assignment = re.compile(r"""
+    \s*([a-zA-Z_]\w*)\s*=
+    (?:\s|[,;\[\]]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)*$
+""", re.VERBOSE | re.UNICODE)
+
+
+def align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def parse_arguments(arguments):
+    """
+    Split the arguments of save into the filename and whether the binary
+    format was asked for with -binary, -text or a .mlw extension. The
+    format is None if nothing chose it
+    """
+    binary = None
+    words = arguments.split()
+    if words and words[0] in ('-binary', '-text'):
+        binary = words.pop(0) == '-binary'
+    filename = " ".join(words)
+    if binary is None and filename.endswith(BINARY_EXTENSION):
+        binary = True
+    return filename, binary
+
+
+def is_binary(filename):
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def load(filename, context, run_line):
+    """
+    Index the workspace in filename into context. Text lines that are not
+    plain literal assignments are passed to run_line straight away
+    :return: the names of the indexed variables
+    """
+    names = []
+    if is_binary(filename):
+        index, data_start = read_index(filename)
+        for entry in index:
+            context.defer(
+                entry['name'],
+                partial(read_entry, filename, entry, data_start)
+            )
+            names.append(entry['name'])
+        return names
+
+    offset = 0
+    with open(filename, 'rb') as f:
+        for line in f:
+            text = line.decode('utf-8')
+            match = literal_assignment.match(text)
+            if match:
+                context.defer(
+                    match.group(1),
+                    partial(read_text_entry, filename, offset, context)
+                )
+                names.append(match.group(1))
+            else:
+                run_line(text)
+            offset += len(line)
+    return names
+
+
+def read_text_entry(filename, offset, context):
+    """
+    Evaluate the assignment on the line starting at offset
+    """
+    try:
+        with open(filename, 'rb') as f:
+            f.seek(offset)
+            line = f.readline().decode('utf-8')
+    except IOError:
+        raise MatlabetteRuntimeError(
+            "failed to read '{}'".format(os.path.abspath(filename))
+        )
+    parse_tree = Parser(Lexer.lex(line)).parse()
+    return context.prepare(parse_tree.right_child)()
+
+
+def save(filename, context, binary=False):
+    """
+    Write the variables in context to filename. The file is replaced
+    atomically so arrays still mapped from the old file stay valid
+    """
+    context.materialize()
+    temporary = filename + '.tmp'
+    with open(temporary, 'wb') as f:
+        if binary:
+            write_binary(f, context.variables)
+        else:
+            f.write(context.serialize().encode('utf-8'))
+    replace(temporary, filename)
+
+
+def write_binary(f, variables):
+    index = []
+    arrays = []
+    offset = 0
+    for name, value in variables.items():
+        array = numpy.ascontiguousarray(value, dtype=dtype)
+        index.append({
+            'name': name,
+            'shape': list(array.shape) if is_array(value) else [],
+            'offset': offset,
+        })
+        arrays.append((offset, array))
+        offset = align(offset + array.nbytes)
+
+    header = json.dumps({'variables': index}).encode('utf-8')
+    header_end = len(MAGIC) + 8 + len(header)
+    f.write(MAGIC)
+    f.write(struct.pack('<Q', len(header)))
+    f.write(header)
+    f.write(b'\0' * (align(header_end) - header_end))
+    position = 0
+    for offset, array in arrays:
+        f.write(b'\0' * (offset - position))
+        write_array(f, array)
+        position = offset + array.nbytes
+    f.write(b'\0' * (align(position) - position))
+
+
+def write_array(f, array, chunk_size=1 << 20):
+    """
+    Write the data of a contiguous array a chunk at a time, so no full
+    copy of it is made
+    """
+    flat = array.reshape(-1)
+    for start in range(0, flat.size, chunk_size):
+        f.write(flat[start:start + chunk_size].tobytes())
+
+
+def read_index(filename):
+    """
+    Return the variable index of a binary workspace and where its data
+    starts
+    """
+    with open(filename, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise MatlabetteRuntimeError(
+                "'{}' is not a binary workspace".format(filename)
+            )
+        size, = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(size).decode('utf-8'))
+    return header['variables'], align(len(MAGIC) + 8 + size)
+
+
+def read_entry(filename, entry, data_start, mmap_threshold=MMAP_THRESHOLD):
+    """
+    Read one variable of a binary workspace
+    """
+    try:
+        with open(filename, 'rb') as f:
+            return read_variable(
+                f, filename, entry, data_start, mmap_threshold
+            )
+    except IOError:
+        raise MatlabetteRuntimeError(
+            "failed to read '{}'".format(os.path.abspath(filename))
+        )
+
+
+def read_binary(filename, mmap_threshold=MMAP_THRESHOLD):
+    """
+    Return the variables saved in a binary workspace. Arrays of at least
+    mmap_threshold bytes are mapped copy-on-write rather than read
+    """
+    index, data_start = read_index(filename)
+    variables = OrderedDict()
+    with open(filename, 'rb') as f:
+        for entry in index:
+            variables[entry['name']] = read_variable(
+                f, filename, entry, data_start, mmap_threshold
+            )
+    return variables
+
+
+def read_variable(f, filename, entry, data_start, mmap_threshold):
+    shape = tuple(entry['shape'])
+    offset = data_start + entry['offset']
+    count = int(numpy.prod(shape)) if shape else 1
+    if count * dtype.itemsize >= mmap_threshold:
+        return numpy.memmap(
+            filename, dtype=dtype, mode='c', offset=offset, shape=shape
+        ).view(numpy.ndarray)
+    f.seek(offset)
+    data = bytearray(f.read(count * dtype.itemsize))
+    value = numpy.frombuffer(data, dtype=dtype)
+    if not shape:
+        return float(value[0])
+    return value.reshape(shape)
@@ -4,5 +4,6 @@ Run matlabette
 """
 
 if __name__ == '__main__':
+    import sys
     from matlabette.main import run
-    run()
+    sys.exit(run())
@@ -4,7 +4,8 @@ from setuptools import setup, find_packages
 setup(
     name="Matlabette",
     version="0.1",
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*',
+                                    'tests', 'tests.*']),
     author="Humphrey Thuo",
     author_email="thuohm@gmail.com",
     description="A minimal REPL clone of MATLAB",
@@ -34,6 +35,10 @@ Features
         'colorama==0.3.7',
         'numpy==1.11.0'
     ],
+    extras_require={
+        # LU and Cholesky factorizations that repeated solves reuse
+        'fast': ['scipy>=0.17'],
+    },
     entry_points= {
         'console_scripts': [
             'matlabette = matlabette.main:run',
@@ -0,0 +1,201 @@
+"""
+Tests that compiled statements give the same results as the tree-walker
+"""
+from __future__ import unicode_literals
+from matlabette.context import Context
+from matlabette.display import Display
+from matlabette.errors import MatlabetteError, JobCancelled
+from matlabette.fusion import FusedExpression
+from matlabette.lexer import Lexer
+from matlabette.parser import Parser
+import numpy
+import unittest
+
+corpus = """
+a = [1 2; 3 4]
+b = a * a
+inv(a)
+a'
+c = a .* 2 + 1
+x = 3 - 1 - 1
+y = [1 2] * [3; 4]
+z = 2 - [1 2]
+w = a ./ 2
+e = []
+q = [1 2; 3]
+inv(3)
+k = [a 1]
+a + [1 2 3]
+undefined
+u = undefined + 1
+t = transpose(a)
+foo(1)
+inv(a, a)
+v = [1 2]'
+m = x * a - 4 / 2
+a * [1 2 3]
+2 / a
+a \\ 2
+n = a \\ [1; 2]
+n = [1 2] / a
+n = inv(a) * [1; 2]
+n = [1 2] * inv(a)
+n = -a
+n = 2 * -a'
+n = -a * a - -x
+n = -zeros(1, 2)
+r = 1:5
+r = 0:0.25:1
+r = 5:1
+r = 1:2:10 + 1
+q = 1:[1 2]
+z = zeros(2, 3) + ones(2, 3)
+e = eye(3) * 2
+l = linspace(0, 1, 5)
+o = ones + zeros
+a = [1 2 3; 4 5 6; 7 8 9]
+a(2,3)
+a(2,:)
+a(:,end)
+a(end,end)
+a(2:end, 1:2)
+a(5)
+a(:)
+a([1 3], [3 1])
+a(end-1:-1:1, 1)
+a(0)
+a(4, 1)
+a(1.5)
+x = end
+b = a;
+a(1,1) = 100
+b
+a(:, 2) = [10 20 30]
+a(7:9) = 0
+a(1,:) = [1 2]
+v = 1:5;
+v(2:3) = [9 9]
+c = a(1:2, :);
+a(1, :) = -1
+c
+s = 3;
+s(1) = 7
+a = [1 2; 3 4] + 0;
+a = a + 1
+a = a .* [2 2; 2 2]
+a = a - 1 - 2
+a = a * 2
+a = a / 4
+a = a * [1 0; 0 1]
+b = a;
+a = a + 1
+b
+a = a ./ a'
+d = [1 2];
+d = d + [1 2; 3 4]
+big = ones(400, 500) + 0;
+big = big .* 2 + big - 1 ./ big;
+f = big .* big - big ./ 2 + 1;
+f(400, 500)
+g = big' * big * ones(500, 1);
+g(1)
+b = ones(2, 3) + 0;
+d = ones(3, 2) + 0;
+c = ones(4, 4) + 0;
+r = 0.5 / b .+ s * d * c
+r = b .* 2 - b * b + c * c * c
+r = b + undefined + s * d * c
+r = big .* 2 + big * big - d * d * c;
+r = big .* 2 + big .* d - d * d * c;
+r = big .* 2 + big .* big - d * d * c;
+inv = [5 6]
+inv(2)
+""".strip().splitlines()
+
+
+def run(context, line):
+    """
+    Run line, returning what it displays or its error
+    """
+    try:
+        output = context.execute(Parser(Lexer.lex(line)).parse())
+    except MatlabetteError as e:
+        return 'error', e.message
+    if isinstance(output, Display):
+        output = "".join(output)
+    return 'output', output
+
+
+class ParityTest(unittest.TestCase):
+
+    def test_compiled_matches_tree_walker(self):
+        compiled = Context(use_compiler=True)
+        walker = Context(use_compiler=False)
+        for line in corpus:
+            self.assertEqual(run(compiled, line), run(walker, line), line)
+        self.assertEqual(set(compiled.variables), set(walker.variables))
+        for name, value in walker.variables.items():
+            self.assertIs(type(compiled.variables[name]), type(value), name)
+            numpy.testing.assert_array_equal(
+                compiled.variables[name], value, name
+            )
+
+    def test_statements_run_again(self):
+        context = Context()
+        statement = context.prepare(
+            Parser(Lexer.lex("a = a * 2 + 1;")).parse()
+        )
+        context.store('a', 1.0)
+        statement()
+        statement()
+        self.assertEqual(context.variables['a'], 7.0)
+
+    def test_update_in_place_keeps_the_array(self):
+        context = Context()
+        run(context, "a = ones(2);")
+        array = context.variables['a']
+        version = context.versions['a']
+        run(context, "a = a .* 2;")
+        self.assertIs(context.variables['a'], array)
+        self.assertGreater(context.versions['a'], version)
+        numpy.testing.assert_array_equal(array, [[2, 2], [2, 2]])
+
+    def test_fused_leaves_after_a_failed_step_are_not_evaluated(self):
+        evaluated = []
+
+        def leaf(value):
+            def evaluate():
+                evaluated.append(value)
+                return value
+            return evaluate
+        context = Context()
+        divide = context.binary_operations['/']
+        add = context.binary_operations['.+']
+        # 0.5 / b .+ c, where 0.5 / b fails
+        expression = FusedExpression(
+            [leaf(0.5), leaf(numpy.ones((2, 3))), leaf(numpy.ones((4, 4)))],
+            [('/', divide, 0, 1), ('.+', add, 3, 2)]
+        )
+        with self.assertRaises(MatlabetteError):
+            expression()
+        self.assertEqual(len(evaluated), 2)
+
+    def test_cancelled_statement_changes_nothing(self):
+        context = Context()
+        run(context, "a = ones(2);")
+        version = context.versions['a']
+        context.cancelled = True
+        for line in ["a = a .* 2;", "a(1) = 5;", "b = a * a * a;"]:
+            for use_compiler in (True, False):
+                context.use_compiler = use_compiler
+                with self.assertRaises(JobCancelled):
+                    run(context, line)
+        self.assertEqual(context.versions['a'], version)
+        self.assertNotIn('b', context.variables)
+        numpy.testing.assert_array_equal(
+            context.variables['a'], numpy.ones((2, 2))
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
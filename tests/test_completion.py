@@ -0,0 +1,99 @@
+"""
+Tests for completing names at the prompt
+"""
+from __future__ import unicode_literals
+from matlabette.completion import (
+    CompletionIndex, PrefixTrie, prompt_completer
+)
+from prompt_toolkit.document import Document
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class PrefixTrieTest(unittest.TestCase):
+
+    def test_complete(self):
+        trie = PrefixTrie(["zeros", "zip", "ones", "zeta"])
+        self.assertEqual(trie.complete("ze"), ["zeta", "zeros"])
+        self.assertEqual(trie.complete("x"), [])
+        self.assertEqual(len(trie.complete("")), 4)
+
+    def test_shortest_first(self):
+        trie = PrefixTrie(["abcd", "ab", "abc", "abd"])
+        self.assertEqual(trie.complete("a"), ["ab", "abc", "abd", "abcd"])
+        self.assertEqual(trie.complete("a", limit=2), ["ab", "abc"])
+
+    def test_case_insensitive(self):
+        trie = PrefixTrie(["Alpha", "alpha", "ALPS"])
+        self.assertEqual(trie.complete("AL"), ["ALPS", "Alpha", "alpha"])
+        self.assertEqual(trie.complete("alp"), ["ALPS", "Alpha", "alpha"])
+        self.assertIn("Alpha", trie)
+        self.assertNotIn("ALPHA", trie)
+
+    def test_words_are_counted_once(self):
+        trie = PrefixTrie(["a", "a", "A"])
+        self.assertEqual(len(trie), 2)
+
+
+class CompletionIndexTest(unittest.TestCase):
+
+    def test_names_in_a_line(self):
+        index = CompletionIndex()
+        index.add_line("total_2 = inv(matrix) * [1 2]'")
+        self.assertEqual(sorted(index.complete("")),
+                         ["inv", "matrix", "total_2"])
+
+    def complete(self, index, text):
+        completer = prompt_completer(index)
+        return [
+            (completion.text, completion.start_position)
+            for completion in completer.get_completions(Document(text), None)
+        ]
+
+    def test_prompt_completer(self):
+        index = CompletionIndex(["zeros", "Zebra", "ones"])
+        self.assertEqual(self.complete(index, "a = ZE"),
+                         [("Zebra", -2), ("zeros", -2)])
+        self.assertEqual(self.complete(index, "zeros"), [])
+        self.assertEqual(self.complete(index, "a = "), [])
+
+
+class ReplCompletionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.home = os.environ.get('HOME')
+        os.environ['HOME'] = self.directory
+
+    def tearDown(self):
+        if self.home is None:
+            del os.environ['HOME']
+        else:
+            os.environ['HOME'] = self.home
+        shutil.rmtree(self.directory)
+
+    def test_new_variables_are_offered(self):
+        from matlabette.repl import Repl
+        repl = Repl()
+        self.assertEqual(repl.completions.complete("fir"), [])
+        repl.eval("First_Value = 1;")
+        repl.jobs.wait()
+        repl.context.store('firmware', 2.0)
+        repl.add_new_names()
+        self.assertEqual(repl.completions.complete("fir"),
+                         ["firmware", "First_Value"])
+
+    def test_names_from_the_history_are_offered(self):
+        from prompt_toolkit.history import FileHistory
+        os.mkdir(os.path.join(self.directory, '.matlabette'))
+        FileHistory(
+            os.path.join(self.directory, '.matlabette', 'history')
+        ).append("old_name = 3")
+        from matlabette.repl import Repl
+        self.assertEqual(Repl().completions.complete("OLD"), ["old_name"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+"""
+Tests for the context
+"""
+from __future__ import unicode_literals
+from matlabette.context import Context
+from matlabette.errors import MatlabetteError
+from matlabette.lexer import Lexer
+from matlabette.parser import Parser
+import unittest
+
+
+class TimerTest(unittest.TestCase):
+    use_compiler = True
+
+    def setUp(self):
+        self.context = Context(use_compiler=self.use_compiler)
+
+    def run_line(self, line):
+        return self.context.execute(Parser(Lexer.lex(line)).parse())
+
+    def test_toc_in_an_expression(self):
+        self.run_line("tic")
+        self.run_line("t = toc;")
+        self.run_line("elapsed = toc * 1000;")
+        self.assertIsInstance(self.context.variables['t'], float)
+        self.assertGreaterEqual(self.context.variables['t'], 0)
+        self.assertGreaterEqual(self.context.variables['elapsed'], 0)
+
+    def test_toc_since_a_saved_tic(self):
+        self.run_line("s = tic;")
+        self.run_line("d = toc(s);")
+        self.assertGreaterEqual(self.context.variables['d'], 0)
+
+    def test_bare_toc_shows_the_time(self):
+        self.run_line("tic")
+        self.assertIn("Elapsed time is", self.run_line("toc"))
+
+    def test_toc_before_tic(self):
+        with self.assertRaises(MatlabetteError):
+            self.run_line("t = toc;")
+
+    def test_variable_hides_the_function(self):
+        self.run_line("o = ones;")
+        self.assertEqual(self.context.variables['o'], 1.0)
+        self.run_line("ones = 5;")
+        self.run_line("o = ones;")
+        self.assertEqual(self.context.variables['o'], 5.0)
+
+    def test_undefined_name(self):
+        with self.assertRaises(MatlabetteError):
+            self.run_line("t = undefined;")
+
+
+class TreeWalkerTimerTest(TimerTest):
+    use_compiler = False
+
+
+if __name__ == '__main__':
+    unittest.main()
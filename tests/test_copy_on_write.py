@@ -0,0 +1,89 @@
+"""
+Tests that variables share arrays until one of them is changed
+"""
+from __future__ import unicode_literals
+from matlabette.context import Context
+from matlabette.lexer import Lexer
+from matlabette.parser import Parser
+import numpy
+import unittest
+
+
+class CopyOnWriteTest(unittest.TestCase):
+    use_compiler = True
+
+    def setUp(self):
+        self.context = Context(use_compiler=self.use_compiler)
+        self.run_line("a = [1 2 3; 4 5 6];")
+
+    def run_line(self, line):
+        return self.context.execute(Parser(Lexer.lex(line)).parse())
+
+    def value(self, name):
+        return self.context.variables[name]
+
+    def test_assignment_shares_the_array(self):
+        self.run_line("b = a;")
+        self.assertIs(self.value('a'), self.value('b'))
+        self.assertTrue(self.context.is_shared(self.value('a')))
+
+    def test_indexed_write_copies_a_shared_array(self):
+        self.run_line("b = a;")
+        self.run_line("b(1) = 10;")
+        numpy.testing.assert_array_equal(
+            self.value('a'), [[1, 2, 3], [4, 5, 6]]
+        )
+        numpy.testing.assert_array_equal(
+            self.value('b'), [[10, 2, 3], [4, 5, 6]]
+        )
+        self.assertFalse(self.context.is_shared(self.value('a')))
+        self.assertFalse(self.context.is_shared(self.value('b')))
+
+    def test_indexed_write_to_an_unshared_array_is_in_place(self):
+        # the literal is the parser's read-only constant, so it is copied
+        # on the first write and written in place after that
+        literal = self.value('a')
+        self.run_line("a(2, 3) = 0;")
+        array = self.value('a')
+        self.assertIsNot(array, literal)
+        self.assertEqual(literal[1, 2], 6)
+        self.run_line("a(1, 1) = 0;")
+        self.assertIs(self.value('a'), array)
+        numpy.testing.assert_array_equal(array, [[0, 2, 3], [4, 5, 0]])
+
+    def test_view_is_copied_before_a_write(self):
+        self.run_line("b = a(1, :);")
+        self.assertTrue(numpy.may_share_memory(self.value('a'),
+                                               self.value('b')))
+        self.run_line("b(1) = 10;")
+        numpy.testing.assert_array_equal(self.value('a')[0], [1, 2, 3])
+        numpy.testing.assert_array_equal(self.value('b'), [[10, 2, 3]])
+
+    def test_write_to_viewed_array_leaves_the_view(self):
+        self.run_line("b = a(1, :);")
+        self.run_line("a(1, 1) = 10;")
+        numpy.testing.assert_array_equal(self.value('b'), [[1, 2, 3]])
+        self.assertEqual(self.value('a')[0, 0], 10)
+
+    def test_update_doesnt_write_through_to_a_shared_array(self):
+        self.run_line("b = a;")
+        self.run_line("a = a + 1;")
+        numpy.testing.assert_array_equal(
+            self.value('b'), [[1, 2, 3], [4, 5, 6]]
+        )
+        numpy.testing.assert_array_equal(
+            self.value('a'), [[2, 3, 4], [5, 6, 7]]
+        )
+
+    def test_reassigning_releases_the_array(self):
+        self.run_line("b = a;")
+        self.run_line("b = 1;")
+        self.assertFalse(self.context.is_shared(self.value('a')))
+
+
+class TreeWalkerCopyOnWriteTest(CopyOnWriteTest):
+    use_compiler = False
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+Tests for displaying variables
+"""
+from __future__ import unicode_literals
+from matlabette import display
+from matlabette.display import Display, format_numbers
+import numpy
+import os
+import unittest
+
+
+def lines(*rows):
+    return "".join(row + os.linesep for row in rows)
+
+
+class FormatNumbersTest(unittest.TestCase):
+
+    def test_matches_str(self):
+        values = numpy.array([
+            0.0, -0.0, 1.0, -2.0, 0.1, 1 / 3.0, -2.5, 1e-5, 1.5e-10, 1e11,
+            123456789012.0, -123456789012.0, 1e12, 1e15, 1e16, 2.0 ** 60,
+            1234.5678901234, float('inf'), float('-inf'), float('nan'),
+        ])
+        self.assertEqual(list(format_numbers(values)),
+                         [str(float(value)) for value in values])
+
+    def test_keeps_the_shape(self):
+        values = numpy.arange(6.0).reshape(2, 3)
+        self.assertEqual(format_numbers(values).shape, (2, 3))
+        self.assertEqual(list(format_numbers(values)[1]),
+                         ["3.0", "4.0", "5.0"])
+
+
+class DisplayTest(unittest.TestCase):
+
+    def assertDisplays(self, display, text):
+        self.assertEqual("".join(display), text)
+
+    def test_scalar(self):
+        self.assertDisplays(Display('s', 2.5), lines("", " s = 2.5"))
+
+    def test_empty(self):
+        self.assertDisplays(
+            Display('e', numpy.empty((0, 0))), lines("", " e = []")
+        )
+
+    def test_row_vector(self):
+        self.assertDisplays(
+            Display('v', numpy.array([[1.5, -2.0, 3.0]])),
+            lines("", " v =", "    1.5    -2.0    3.0")
+        )
+
+    def test_column_vector(self):
+        self.assertDisplays(
+            Display('v', numpy.array([[1.0], [2.0]])),
+            lines("", " v =", "    1.0", "    2.0")
+        )
+
+    def test_within_the_limit_is_shown_in_full(self):
+        value = numpy.arange(100.0).reshape(10, 10)
+        text = "".join(Display('a', value, limit=100, edge=2))
+        self.assertNotIn("...", text)
+        self.assertEqual(len(text.splitlines()), 12)
+
+    def test_small_dimensions_are_not_elided(self):
+        value = numpy.arange(16.0).reshape(4, 4)
+        text = "".join(Display('a', value, limit=4, edge=2))
+        self.assertNotIn("...", text)
+
+    def test_rows_and_columns_are_elided(self):
+        value = numpy.arange(1.0, 401.0).reshape(20, 20)
+        self.assertDisplays(Display('a', value, limit=100, edge=2), lines(
+            "", " a =",
+            "    1.0    2.0    ...    19.0    20.0",
+            "    21.0    22.0    ...    39.0    40.0",
+            "    ...",
+            "    361.0    362.0    ...    379.0    380.0",
+            "    381.0    382.0    ...    399.0    400.0",
+            " [20x20 float64, first and last 2 rows and columns shown]",
+        ))
+
+    def test_rows_are_elided(self):
+        value = numpy.arange(1.0, 41.0).reshape(20, 2)
+        self.assertDisplays(Display('a', value, limit=10, edge=1), lines(
+            "", " a =",
+            "    1.0    2.0",
+            "    ...",
+            "    39.0    40.0",
+            " [20x2 float64, first and last 1 rows shown]",
+        ))
+
+    def test_row_vector_columns_are_elided(self):
+        value = numpy.arange(1.0, 31.0).reshape(1, 30)
+        self.assertDisplays(Display('v', value, limit=10), lines(
+            "", " v =",
+            "    1.0    2.0    3.0    4.0    5.0    ...    "
+            "26.0    27.0    28.0    29.0    30.0",
+            " [1x30 float64, first and last 5 columns shown]",
+        ))
+
+    def test_rows_are_formatted_in_blocks(self):
+        block_size = display.block_size
+        display.block_size = 4
+        try:
+            value = numpy.arange(30.0).reshape(10, 3)
+            text = "".join(Display('a', value))
+        finally:
+            display.block_size = block_size
+        self.assertEqual(text, "".join(Display('a', value)))
+        self.assertEqual(text.splitlines()[-1], "    27.0    28.0    29.0")
+
+    def test_rendered_while_iterating(self):
+        value = numpy.arange(1e4).reshape(100, 100)
+        parts = iter(Display('a', value))
+        self.assertEqual(next(parts), lines("", " a ="))
+        self.assertTrue(next(parts).startswith("    0.0    1.0"))
+
+
+if __name__ == '__main__':
+    unittest.main()
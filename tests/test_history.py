@@ -0,0 +1,72 @@
+"""
+Tests for reading and compacting the prompt's history file
+"""
+from __future__ import unicode_literals
+from matlabette import history
+from prompt_toolkit.history import FileHistory
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class HistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'history')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, entries):
+        """
+        Append entries the way the prompt does
+        """
+        file_history = FileHistory(self.filename)
+        for entry in entries:
+            file_history.append(entry)
+
+    def contents(self):
+        with open(self.filename, 'rb') as f:
+            return f.read()
+
+    def test_missing_file(self):
+        self.assertEqual(history.load(self.filename), [])
+        self.assertFalse(os.path.exists(self.filename))
+
+    def test_entries(self):
+        entries = ["a = 1", "b = [1 2;\n3 4]", "", "\u03b1 = 2"]
+        self.write(entries)
+        self.assertEqual(history.load(self.filename), entries)
+
+    def test_file_within_the_limit_is_left_alone(self):
+        self.write(["a = {}".format(i) for i in range(5)])
+        contents = self.contents()
+        history.load(self.filename, max_entries=5)
+        self.assertEqual(self.contents(), contents)
+
+    def test_compaction_keeps_the_last_entries(self):
+        entries = ["a = {}".format(i) for i in range(10)] + ["b = [1\n2]"]
+        self.write(entries)
+        self.assertEqual(history.load(self.filename, max_entries=3),
+                         entries[-3:])
+        self.assertEqual(os.listdir(self.directory), ['history'])
+        # the prompt reads the compacted file, and keeps appending to it
+        self.assertEqual(list(FileHistory(self.filename)), entries[-3:])
+        self.write(["c = 3"])
+        self.assertEqual(list(FileHistory(self.filename)),
+                         entries[-3:] + ["c = 3"])
+        self.assertEqual(history.load(self.filename, max_entries=3),
+                         entries[-2:] + ["c = 3"])
+
+    def test_compaction_keeps_the_times(self):
+        self.write(["a = 1", "b = 2"])
+        times = [line for line in self.contents().splitlines()
+                 if line.startswith(b'#')]
+        history.load(self.filename, max_entries=1)
+        self.assertEqual(self.contents(), b"\n" + times[1] + b"\n+b = 2\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+"""
+Tests for MATLAB style indexing
+"""
+from __future__ import unicode_literals
+from matlabette import indexing
+from matlabette.context import Context
+from matlabette.errors import MatlabetteError
+from matlabette.lexer import Lexer
+from matlabette.parser import Parser
+import numpy
+import unittest
+
+
+def matrix():
+    return numpy.arange(1.0, 10.0).reshape(3, 3)
+
+
+class PositionsTest(unittest.TestCase):
+
+    def test_scalar_is_a_slice(self):
+        self.assertEqual(indexing.positions(2.0, 3), slice(1, 2))
+
+    def test_constant_step_is_a_slice(self):
+        self.assertEqual(
+            indexing.positions(numpy.array([[1.0, 3.0, 5.0]]), 5),
+            slice(0, 6, 2)
+        )
+        self.assertEqual(
+            indexing.positions(numpy.array([[3.0, 2.0, 1.0]]), 3),
+            slice(2, None, -1)
+        )
+
+    def test_other_indices_are_positions(self):
+        numpy.testing.assert_array_equal(
+            indexing.positions(numpy.array([[1.0, 3.0, 2.0]]), 3), [0, 2, 1]
+        )
+
+    def test_invalid_indices(self):
+        for index in [0.0, 1.5, -1.0, float('nan')]:
+            with self.assertRaises(MatlabetteError):
+                indexing.positions(index, 3)
+        with self.assertRaises(MatlabetteError):
+            indexing.positions(4.0, 3)
+
+
+class ReadTest(unittest.TestCase):
+
+    def test_element(self):
+        self.assertEqual(indexing.read(matrix(), [2.0, 3.0]), 6.0)
+
+    def test_linear_index_is_column_major(self):
+        self.assertEqual(indexing.read(matrix(), [2.0]), 4.0)
+        numpy.testing.assert_array_equal(
+            indexing.read(matrix(), [numpy.array([[1.0, 2.0, 4.0]])]),
+            [[1, 4, 2]]
+        )
+
+    def test_vector_is_indexed_along_its_length(self):
+        vector = numpy.array([[5.0, 6.0, 7.0]])
+        self.assertEqual(indexing.read(vector, [3.0]), 7.0)
+        numpy.testing.assert_array_equal(
+            indexing.read(vector.T, [numpy.array([[1.0, 2.0]])]), [[5], [6]]
+        )
+
+    def test_slices_are_views(self):
+        value = matrix()
+        row = indexing.read(value, [2.0, slice(None)])
+        numpy.testing.assert_array_equal(row, [[4, 5, 6]])
+        self.assertTrue(numpy.may_share_memory(row, value))
+
+    def test_index_vectors_select_a_copy(self):
+        value = matrix()
+        result = indexing.read(value, [
+            numpy.array([[1.0, 3.0, 2.0]]), numpy.array([[3.0, 1.0, 2.0]])
+        ])
+        numpy.testing.assert_array_equal(
+            result, [[3, 1, 2], [9, 7, 8], [6, 4, 5]]
+        )
+        self.assertFalse(numpy.may_share_memory(result, value))
+
+    def test_colon_alone_is_a_column(self):
+        numpy.testing.assert_array_equal(
+            indexing.read(matrix(), [slice(None)]),
+            [[1], [4], [7], [2], [5], [8], [3], [6], [9]]
+        )
+
+    def test_scalar_is_1x1(self):
+        self.assertEqual(indexing.read(5.0, [1.0, 1.0]), 5.0)
+        with self.assertRaises(MatlabetteError):
+            indexing.read(5.0, [2.0])
+
+
+class WriteTest(unittest.TestCase):
+
+    def test_element(self):
+        value = matrix()
+        indexing.write(value, [1.0, 2.0], 0.0)
+        self.assertEqual(value[0, 1], 0)
+
+    def test_linear_indices(self):
+        value = matrix()
+        indexing.write(
+            value, [numpy.array([[2.0, 4.0]])], numpy.array([[10.0, 20.0]])
+        )
+        numpy.testing.assert_array_equal(
+            value, [[1, 20, 3], [10, 5, 6], [7, 8, 9]]
+        )
+
+    def test_column(self):
+        value = matrix()
+        indexing.write(
+            value, [slice(None), 2.0], numpy.array([[10.0, 20.0, 30.0]])
+        )
+        numpy.testing.assert_array_equal(value[:, 1], [10, 20, 30])
+
+    def test_all(self):
+        value = matrix()
+        indexing.write(value, [slice(None)], 0.0)
+        numpy.testing.assert_array_equal(value, numpy.zeros((3, 3)))
+
+    def test_dimension_mismatch(self):
+        with self.assertRaises(MatlabetteError):
+            indexing.write(
+                matrix(), [1.0, slice(None)], numpy.array([[1.0, 2.0]])
+            )
+
+
+class ContextIndexingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.context = Context()
+        self.run_line("a = [1 2 3; 4 5 6; 7 8 9];")
+
+    def run_line(self, line):
+        return self.context.execute(Parser(Lexer.lex(line)).parse())
+
+    def test_end(self):
+        self.run_line("x = a(end, end - 1);")
+        self.assertEqual(self.context.variables['x'], 8.0)
+        self.run_line("y = a(end);")
+        self.assertEqual(self.context.variables['y'], 9.0)
+        self.run_line("z = a(2:end, 1);")
+        numpy.testing.assert_array_equal(
+            self.context.variables['z'], [[4], [7]]
+        )
+
+    def test_end_outside_an_index(self):
+        with self.assertRaises(MatlabetteError):
+            self.run_line("x = end")
+
+    def test_function_is_called_without_a_variable(self):
+        self.run_line("z = zeros(2);")
+        numpy.testing.assert_array_equal(
+            self.context.variables['z'], numpy.zeros((2, 2))
+        )
+        self.run_line("zeros = [4 5];")
+        self.run_line("z = zeros(2);")
+        self.assertEqual(self.context.variables['z'], 5.0)
+
+    def test_assignment_to_a_scalar_keeps_it_scalar(self):
+        self.run_line("s = 3;")
+        self.run_line("s(1) = 7;")
+        self.assertEqual(self.context.variables['s'], 7.0)
+        self.assertIsInstance(self.context.variables['s'], float)
+
+
+if __name__ == '__main__':
+    unittest.main()
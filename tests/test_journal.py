@@ -0,0 +1,134 @@
+"""
+Tests for the journal of the default workspace
+"""
+from __future__ import unicode_literals
+from matlabette.cache import StatementCache
+from matlabette.context import Context
+from matlabette.journal import Journal
+import numpy
+import os
+import shutil
+import tempfile
+import unittest
+
+
+def new_context():
+    context = Context()
+    statements = StatementCache()
+
+    def run_line(line):
+        statements.statement(line, context)()
+    return context, run_line
+
+
+class JournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.snapshot = os.path.join(self.directory, 'workspace')
+        open(self.snapshot, 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def load(self):
+        """
+        Start a session that loads the default workspace
+        """
+        context, run_line = new_context()
+        journal = Journal(self.snapshot)
+        journal.load(context, run_line)
+        context.materialize()
+        return context, journal
+
+    def names(self, journal):
+        return [entry['name'] for entry in journal.records()]
+
+    def test_save_appends_the_changed_variables(self):
+        context, journal = self.load()
+        context.store('a', numpy.ones((2, 3)))
+        context.store('b', 2.0)
+        journal.save(context)
+        snapshot_size = os.path.getsize(self.snapshot)
+        context.store('b', 3.0)
+        journal.save(context)
+        self.assertEqual(os.path.getsize(self.snapshot), snapshot_size)
+        self.assertEqual(self.names(journal), ['b'])
+        self.assertFalse(context.dirty)
+
+    def test_load_replays_the_journal(self):
+        context, journal = self.load()
+        context.store('a', numpy.arange(6.0).reshape(2, 3))
+        context.store('b', 2.0)
+        journal.save(context)
+        context.store('b', 3.0)
+        context.store('c', numpy.empty((0, 0)))
+        journal.save(context)
+
+        loaded, _ = self.load()
+        self.assertEqual(sorted(loaded.variables), ['a', 'b', 'c'])
+        numpy.testing.assert_array_equal(
+            loaded.variables['a'], [[0, 1, 2], [3, 4, 5]]
+        )
+        self.assertEqual(loaded.variables['b'], 3.0)
+        self.assertEqual(loaded.variables['c'].shape, (0, 0))
+        self.assertFalse(loaded.dirty)
+
+    def test_truncated_record_is_ignored(self):
+        context, journal = self.load()
+        context.store('a', 1.0)
+        journal.save(context)
+        context.store('a', 2.0)
+        journal.save(context)
+        context.store('a', numpy.ones((10, 10)))
+        journal.save(context)
+        # as if the last save was interrupted
+        with open(journal.path, 'r+b') as f:
+            f.truncate(os.path.getsize(journal.path) - 100)
+
+        loaded, _ = self.load()
+        self.assertEqual(loaded.variables['a'], 2.0)
+
+    def test_journal_of_an_older_snapshot_is_ignored(self):
+        context, journal = self.load()
+        context.store('a', 1.0)
+        journal.save(context)
+        context.store('a', 2.0)
+        journal.save(context)
+        # another program rewrites the workspace
+        with open(self.snapshot, 'w') as f:
+            f.write("b = 5.0\n")
+
+        loaded, _ = self.load()
+        self.assertEqual(loaded.variables, {'b': 5.0})
+
+    def test_save_without_load_writes_only_the_context(self):
+        context, journal = self.load()
+        context.store('x', 1.0)
+        context.store('y', 2.0)
+        journal.save(context)
+        context.store('y', 3.0)
+        journal.save(context)
+
+        # a new session that never loads the workspace
+        fresh, run_line = new_context()
+        fresh.store('z', 4.0)
+        Journal(self.snapshot).save(fresh)
+
+        loaded, _ = self.load()
+        self.assertEqual(loaded.variables, {'z': 4.0})
+
+    def test_save_after_another_session_saved_compacts(self):
+        first, first_journal = self.load()
+        second, second_journal = self.load()
+        first.store('a', 1.0)
+        first_journal.save(first)
+        second.store('b', 2.0)
+        second_journal.save(second)
+
+        loaded, _ = self.load()
+        self.assertEqual(loaded.variables, {'b': 2.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
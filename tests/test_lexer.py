@@ -0,0 +1,117 @@
+"""
+Tests for the lexer
+"""
+from __future__ import unicode_literals
+from matlabette.lexer import Lexer, Token
+import unittest
+
+
+class LexerTest(unittest.TestCase):
+
+    def assertTokens(self, line, tokens):
+        self.assertEqual(
+            Lexer.lex(line), tokens + [(Token.END_OF_LINE, '\n')]
+        )
+
+    def test_assignment(self):
+        self.assertTokens("a = [1 2; 3 4]", [
+            (Token.VARIABLE_NAME, 'a'),
+            (Token.ASSIGN_OPERATOR, '='),
+            (Token.LEFT_SQUARE_BRACKET, '['),
+            (Token.INTEGER_LITERAL, '1'),
+            (Token.INTEGER_LITERAL, '2'),
+            (Token.SEMI_COLON, ';'),
+            (Token.INTEGER_LITERAL, '3'),
+            (Token.INTEGER_LITERAL, '4'),
+            (Token.RIGHT_SQUARE_BRACKET, ']'),
+        ])
+
+    def test_operators(self):
+        self.assertTokens("+ - * / \\ .+ .- .* ./ : ,", [
+            (Token.ADD_OPERATOR, '+'),
+            (Token.SUBTRACT_OPERATOR, '-'),
+            (Token.MULTIPLY_OPERATOR, '*'),
+            (Token.DIVIDE_OPERATOR, '/'),
+            (Token.LEFT_DIVIDE_OPERATOR, '\\'),
+            (Token.ELEM_ADD_OPERATOR, '.+'),
+            (Token.ELEM_SUBTRACT_OPERATOR, '.-'),
+            (Token.ELEM_MULTIPLY_OPERATOR, '.*'),
+            (Token.ELEM_DIVIDE_OPERATOR, './'),
+            (Token.COLON, ':'),
+            (Token.COMMA, ','),
+        ])
+
+    def test_numbers(self):
+        self.assertTokens("1 2.5 .5 1.e5 3e-2 4.", [
+            (Token.INTEGER_LITERAL, '1'),
+            (Token.FLOAT_LITERAL, '2.5'),
+            (Token.FLOAT_LITERAL, '.5'),
+            (Token.FLOAT_LITERAL, '1.e5'),
+            (Token.FLOAT_LITERAL, '3e-2'),
+            (Token.FLOAT_LITERAL, '4.'),
+        ])
+
+    def test_element_wise_operator_after_integer(self):
+        self.assertTokens("1.*a", [
+            (Token.INTEGER_LITERAL, '1'),
+            (Token.ELEM_MULTIPLY_OPERATOR, '.*'),
+            (Token.VARIABLE_NAME, 'a'),
+        ])
+
+    def test_transpose_and_string(self):
+        self.assertTokens("b = a'' + inv(a)' + [1 2]'", [
+            (Token.VARIABLE_NAME, 'b'),
+            (Token.ASSIGN_OPERATOR, '='),
+            (Token.VARIABLE_NAME, 'a'),
+            (Token.TRANSPOSE_OPERATOR, "'"),
+            (Token.TRANSPOSE_OPERATOR, "'"),
+            (Token.ADD_OPERATOR, '+'),
+            (Token.VARIABLE_NAME, 'inv'),
+            (Token.LEFT_PARENTHESIS, '('),
+            (Token.VARIABLE_NAME, 'a'),
+            (Token.RIGHT_PARENTHESIS, ')'),
+            (Token.TRANSPOSE_OPERATOR, "'"),
+            (Token.ADD_OPERATOR, '+'),
+            (Token.LEFT_SQUARE_BRACKET, '['),
+            (Token.INTEGER_LITERAL, '1'),
+            (Token.INTEGER_LITERAL, '2'),
+            (Token.RIGHT_SQUARE_BRACKET, ']'),
+            (Token.TRANSPOSE_OPERATOR, "'"),
+        ])
+        self.assertTokens("s = 'it'", [
+            (Token.VARIABLE_NAME, 's'),
+            (Token.ASSIGN_OPERATOR, '='),
+            (Token.STRING_LITERAL, "'it'"),
+        ])
+
+    def test_keywords_comments_and_unknown(self):
+        self.assertTokens("a(end) $ % a comment", [
+            (Token.VARIABLE_NAME, 'a'),
+            (Token.LEFT_PARENTHESIS, '('),
+            (Token.KEYWORD, 'end'),
+            (Token.RIGHT_PARENTHESIS, ')'),
+            (Token.UNKNOWN, '$'),
+        ])
+
+    def test_new_lines_and_bytes(self):
+        self.assertEqual(Lexer.lex("\na = 1\n\n"), Lexer.lex("a = 1"))
+        self.assertEqual(Lexer.lex(b"a = 1"), Lexer.lex("a = 1"))
+        self.assertEqual(Lexer.lex(""), [(Token.END_OF_LINE, '\n')])
+
+    def test_matches_pygments(self):
+        for line in [
+            "a = [1 2; 3 4]",
+            "b = a' * 2.5e3",
+            "c = a .* b ./ 2 - 1",
+            "y = a\\b",
+            "z = inv(a)'",
+            "r = 1:0.5:10",
+            "x = f(2, 3) + b(1);",
+        ]:
+            self.assertEqual(
+                Lexer.lex(line), Lexer.pygments_lex(line), line
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
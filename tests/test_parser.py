@@ -0,0 +1,46 @@
+"""
+Tests for the parser
+"""
+from __future__ import unicode_literals
+from matlabette.errors import MatlabetteSyntaxError
+from matlabette.lexer import Lexer
+from matlabette.parser import Parser
+import unittest
+
+
+def parse(line):
+    return Parser(Lexer.lex(line)).parse()
+
+
+class NegationTest(unittest.TestCase):
+
+    def test_negative_number_is_a_literal(self):
+        tree = parse("x = -3")
+        self.assertEqual(tree.right_child.value, -3.0)
+        self.assertIsNone(tree.right_child.operator)
+
+    def test_negated_variable(self):
+        negation = parse("y = -a").right_child
+        self.assertEqual(negation.operator, '-')
+        self.assertEqual(negation.left_child.value, 0.0)
+        self.assertEqual(negation.right_child.value, 'a')
+
+    def test_negation_binds_tighter_than_products(self):
+        product = parse("y = -a * b").right_child
+        self.assertEqual(product.operator, '*')
+        self.assertEqual(product.left_child.operator, '-')
+        self.assertEqual(product.left_child.right_child.value, 'a')
+
+    def test_negated_operands(self):
+        for line in ["y = 2 * -a", "y = a - -b", "y = - -a", "y = -[a 1]",
+                     "y = -zeros(2)", "y = -a'"]:
+            parse(line)
+
+    def test_minus_without_an_operand(self):
+        for line in ["y = -", "y = -;", "y = 2 * -", "y = - = 3"]:
+            with self.assertRaises(MatlabetteSyntaxError):
+                parse(line)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,276 @@
+"""
+Tests for saving and loading workspaces
+"""
+from __future__ import unicode_literals
+from matlabette import files, workspace
+from matlabette.cache import StatementCache
+from matlabette.context import Context
+from matlabette.errors import MatlabetteError
+import json
+import numpy
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+
+def new_context():
+    context = Context()
+    statements = StatementCache()
+
+    def run_line(line):
+        statements.statement(line, context)()
+    return context, run_line
+
+
+def large_array():
+    """
+    An array just big enough to be memory mapped when loaded
+    """
+    count = workspace.MMAP_THRESHOLD // 8
+    return numpy.arange(float(count)).reshape(count // 256, 256)
+
+
+def sample_variables():
+    return [
+        ('s', 2.5),
+        ('e', numpy.empty((0, 0))),
+        ('m', numpy.array([[1.0, -2.5], [3.25, 4e-10]])),
+        ('v', numpy.array([[1.0, 2.0, 3.0]])),
+        ('big', large_array()),
+    ]
+
+
+class WorkspaceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def save(self, filename, variables, binary=False):
+        context, _ = new_context()
+        for name, value in variables:
+            context.store(name, value)
+        workspace.save(filename, context, binary)
+        return context
+
+    def load(self, filename):
+        context, run_line = new_context()
+        names = workspace.load(filename, context, run_line)
+        return context, names
+
+
+class RoundTripTest(WorkspaceTestCase):
+
+    def assertRoundTrip(self, filename, binary):
+        self.save(filename, sample_variables(), binary)
+        context, names = self.load(filename)
+        self.assertEqual(
+            sorted(names), sorted(name for name, _ in sample_variables())
+        )
+        context.materialize()
+        for name, value in sample_variables():
+            loaded = context.variables[name]
+            if isinstance(value, float):
+                self.assertIsInstance(loaded, float, name)
+                self.assertEqual(loaded, value, name)
+            else:
+                self.assertEqual(loaded.shape, value.shape, name)
+                numpy.testing.assert_array_equal(loaded, value, name)
+
+    def test_text(self):
+        self.assertRoundTrip(self.path('workspace.txt'), False)
+
+    def test_binary(self):
+        self.assertRoundTrip(self.path('workspace.mlw'), True)
+
+    def test_format_is_detected(self):
+        self.save(self.path('text'), [('a', 1.0)])
+        self.save(self.path('binary'), [('a', 1.0)], True)
+        self.assertFalse(workspace.is_binary(self.path('text')))
+        self.assertTrue(workspace.is_binary(self.path('binary')))
+
+    def test_arguments(self):
+        self.assertEqual(workspace.parse_arguments("-binary ws"),
+                         ("ws", True))
+        self.assertEqual(workspace.parse_arguments("-text ws.mlw"),
+                         ("ws.mlw", False))
+        self.assertEqual(workspace.parse_arguments("ws.mlw"),
+                         ("ws.mlw", True))
+        self.assertEqual(workspace.parse_arguments("my ws"),
+                         ("my ws", None))
+
+
+class BinaryFormatTest(WorkspaceTestCase):
+
+    def setUp(self):
+        super(BinaryFormatTest, self).setUp()
+        self.filename = self.path('workspace.mlw')
+        self.save(self.filename, sample_variables(), True)
+        with open(self.filename, 'rb') as f:
+            self.data = f.read()
+
+    def test_header(self):
+        self.assertEqual(self.data[:8], workspace.MAGIC)
+        size, = struct.unpack('<Q', self.data[8:16])
+        header = json.loads(self.data[16:16 + size].decode('utf-8'))
+        entries = header['variables']
+        self.assertEqual(
+            dict((entry['name'], entry['shape']) for entry in entries),
+            {'s': [], 'e': [0, 0], 'm': [2, 2], 'v': [1, 3],
+             'big': list(large_array().shape)}
+        )
+        index, data_start = workspace.read_index(self.filename)
+        self.assertEqual(index, entries)
+        self.assertEqual(data_start, workspace.align(16 + size))
+
+    def test_data_is_aligned(self):
+        index, data_start = workspace.read_index(self.filename)
+        self.assertEqual(data_start % workspace.ALIGNMENT, 0)
+        for entry in index:
+            self.assertEqual(entry['offset'] % workspace.ALIGNMENT, 0)
+        self.assertEqual(len(self.data) % workspace.ALIGNMENT, 0)
+
+    def test_data_is_little_endian_float64(self):
+        index, data_start = workspace.read_index(self.filename)
+        entry, = [entry for entry in index if entry['name'] == 'm']
+        start = data_start + entry['offset']
+        numpy.testing.assert_array_equal(
+            numpy.frombuffer(self.data[start:start + 32], dtype='<f8'),
+            [1.0, -2.5, 3.25, 4e-10]
+        )
+
+    def test_scalar_and_empty_entries(self):
+        variables = workspace.read_binary(self.filename)
+        self.assertIsInstance(variables['s'], float)
+        self.assertEqual(variables['s'], 2.5)
+        self.assertEqual(variables['e'].shape, (0, 0))
+
+    def test_only_large_arrays_are_mapped(self):
+        variables = workspace.read_binary(self.filename)
+        self.assertIsInstance(variables['big'].base, numpy.memmap)
+        self.assertNotIsInstance(variables['m'].base, numpy.memmap)
+        variables = workspace.read_binary(self.filename, mmap_threshold=8)
+        self.assertIsInstance(variables['m'].base, numpy.memmap)
+
+    def test_mapped_arrays_are_copy_on_write(self):
+        context, _ = self.load(self.filename)
+        context.materialize()
+        big = context.variables['big']
+        self.assertIsInstance(big.base, numpy.memmap)
+        big[0, 0] = -1.0
+        with open(self.filename, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        reloaded = workspace.read_binary(self.filename)['big']
+        self.assertEqual(reloaded[0, 0], 0.0)
+
+    def test_not_a_binary_workspace(self):
+        self.save(self.path('text'), [('a', 1.0)])
+        with self.assertRaises(MatlabetteError):
+            workspace.read_index(self.path('text'))
+
+
+class ReplaceTest(WorkspaceTestCase):
+
+    def test_replace_over_an_existing_file(self):
+        with open(self.path('old'), 'w') as f:
+            f.write("old")
+        with open(self.path('new'), 'w') as f:
+            f.write("new")
+        files.replace(self.path('new'), self.path('old'))
+        self.assertEqual(os.listdir(self.directory), ['old'])
+        with open(self.path('old')) as f:
+            self.assertEqual(f.read(), "new")
+
+    def test_save_leaves_no_temporary_file(self):
+        self.save(self.path('workspace'), [('a', 1.0)])
+        self.save(self.path('workspace'), [('a', 2.0)])
+        self.assertEqual(os.listdir(self.directory), ['workspace'])
+
+    def test_mapped_arrays_survive_saving_over_their_file(self):
+        filename = self.path('workspace.mlw')
+        self.save(filename, [('big', large_array())], True)
+        context, _ = self.load(filename)
+        context.materialize()
+        self.assertIsInstance(context.variables['big'].base, numpy.memmap)
+        context.store('s', 1.0)
+        workspace.save(filename, context, True)
+        numpy.testing.assert_array_equal(
+            context.variables['big'], large_array()
+        )
+        loaded, _ = self.load(filename)
+        loaded.materialize()
+        self.assertEqual(sorted(loaded.variables), ['big', 's'])
+        numpy.testing.assert_array_equal(
+            loaded.variables['big'], large_array()
+        )
+
+
+class LazyLoadTest(WorkspaceTestCase):
+
+    def test_variables_load_on_first_use(self):
+        filename = self.path('workspace.mlw')
+        self.save(filename, sample_variables(), True)
+        context, run_line = new_context()
+        workspace.load(filename, context, run_line)
+        self.assertEqual(context.variables, {})
+        self.assertEqual(
+            sorted(context.pending), sorted(n for n, _ in sample_variables())
+        )
+        run_line("x = m(1, 2);")
+        self.assertEqual(context.variables['x'], -2.5)
+        self.assertIn('m', context.variables)
+        self.assertNotIn('m', context.pending)
+        self.assertIn('big', context.pending)
+
+    def test_loader_runs_once(self):
+        context, run_line = new_context()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return numpy.ones((2, 2))
+        context.defer('a', loader)
+        self.assertEqual(calls, [])
+        run_line("b = a + 1;")
+        run_line("c = a .* a;")
+        context.materialize()
+        self.assertEqual(len(calls), 1)
+        numpy.testing.assert_array_equal(context.variables['c'],
+                                         numpy.ones((2, 2)))
+
+    def test_other_lines_run_with_earlier_variables(self):
+        filename = self.path('workspace')
+        with open(filename, 'w') as f:
+            f.write("a = [1 2 3]\nb = a * 2\nc = 4\n")
+        context, names = self.load(filename)
+        self.assertEqual(names, ['a', 'c'])
+        self.assertIn('c', context.pending)
+        numpy.testing.assert_array_equal(context.variables['b'], [[2, 4, 6]])
+
+    def test_save_loads_pending_variables_before_replacing_the_file(self):
+        for binary in (False, True):
+            filename = self.path('workspace')
+            self.save(filename, sample_variables(), binary)
+            context, _ = self.load(filename)
+            context.store('n', 7.0)
+            workspace.save(filename, context, not binary)
+            self.assertEqual(context.pending, {})
+
+            loaded, _ = self.load(filename)
+            loaded.materialize()
+            self.assertEqual(loaded.variables['n'], 7.0)
+            for name, value in sample_variables():
+                numpy.testing.assert_array_equal(
+                    loaded.variables[name], value, name
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()